@@ -1,45 +1,91 @@
 import sys
 import os
+import uuid
 
-# 👇 Add parent directory to Python path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 👇 Add the backend folder to Python path (its modules import each other by name)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "backend")))
 
 import gradio as gr
-from backend.indic_quiz_generator_pipeline import build_english_quiz_agent, build_quiz_prompt, QuizParser
 from dotenv import load_dotenv; load_dotenv()
+from indic_quiz_generator_pipeline import run_parallel_quiz_with_mcq_retry
+from prefetch import QuizPrefetcher
 
-english_quiz_agent = build_english_quiz_agent()
-parser = QuizParser()
+NUM_QUESTIONS = 15
+MAX_AVOIDED_QUESTIONS = 30   # most recent questions the follow-up quiz must not repeat
+PREFETCH_WAIT_SECONDS = 120  # an in-flight prefetch is still faster than starting over
 
-quiz_data = {"questions": [], "index": 0, "answers": [], "last_selected": None}
 
-def generate_quiz(topic, story):
-    final_prompt = build_quiz_prompt(story, num_questions=15)
+def generate_quiz_questions(story: str, avoid_questions: list = None) -> list:
+    quiz = run_parallel_quiz_with_mcq_retry(story, NUM_QUESTIONS, avoid_questions=avoid_questions)
+    return quiz["Quiz"]["Questions"]
+
+
+# Follow-up quizzes are generated while the user is still answering the current one
+prefetcher = QuizPrefetcher(generate_quiz_questions, max_workers=2, max_pending=4, max_per_session=3)
+
+
+def new_session_state() -> dict:
+    return {"session_id": None, "story": "", "questions": [], "index": 0, "answers": [], "last_selected": None, "seen": []}
 
-    try:
-        english_quiz = english_quiz_agent.run(final_prompt)
-    except Exception as e:
-        return (
-            gr.update(visible=True),  # input_form
-            gr.update(visible=False),  # flashcard
-            gr.update(value=f"Error: {str(e)}"),  # question_text
-            gr.update(visible=False),  # radio
-            gr.update(visible=False),  # checkbox
-            gr.update(visible=False),  # mcq_submit_btn
-            gr.update(value=""),  # feedback
-            gr.update(visible=False),  # flip
-            gr.update(visible=False)  # next
-        )
 
-    english_quiz_text = parser.run(english_quiz.content)
-    quiz_data["questions"] = english_quiz_text["Questions"]
+def start_quiz(quiz_data: dict, questions: list):
+    quiz_data["questions"] = questions
     quiz_data["index"] = 0
     quiz_data["answers"] = []
     quiz_data["last_selected"] = None
+    quiz_data["seen"] = (quiz_data["seen"] + [q["Question"] for q in questions])[-MAX_AVOIDED_QUESTIONS:]
+
+    # Start on the next quiz for this story right away (bounded per session)
+    prefetcher.prefetch(quiz_data["session_id"], quiz_data["story"], quiz_data["seen"])
+    return render_question(quiz_data)
+
+
+def error_screen(quiz_data: dict, message: str):
+    return (
+        gr.update(visible=True),  # input_form
+        gr.update(visible=False),  # flashcard
+        gr.update(value=f"Error: {message}"),  # question_text
+        gr.update(visible=False),  # radio
+        gr.update(visible=False),  # checkbox
+        gr.update(visible=False),  # mcq_submit_btn
+        gr.update(value=""),  # feedback
+        gr.update(visible=False),  # flip
+        gr.update(visible=False),  # next
+        gr.update(visible=False),  # try_again
+        quiz_data
+    )
+
+
+def generate_quiz(topic, story, quiz_data):
+    quiz_data["session_id"] = quiz_data["session_id"] or uuid.uuid4().hex
+    if story != quiz_data["story"]:
+        quiz_data["story"] = story
+        quiz_data["seen"] = []
+
+    # A quiz prefetched for this story earlier (by this or another session) is served instantly
+    questions = prefetcher.take(story, timeout=0)
+    if questions is None:
+        try:
+            questions = generate_quiz_questions(story)
+        except Exception as e:
+            return error_screen(quiz_data, str(e))
 
-    return render_question(0)
+    return start_quiz(quiz_data, questions)
 
-def render_question(index):
+
+def try_again(quiz_data):
+    questions = prefetcher.take(quiz_data["story"], timeout=PREFETCH_WAIT_SECONDS)
+    if questions is None:
+        try:
+            questions = generate_quiz_questions(quiz_data["story"], quiz_data["seen"])
+        except Exception as e:
+            return error_screen(quiz_data, str(e))
+
+    return start_quiz(quiz_data, questions)
+
+
+def render_question(quiz_data):
+    index = quiz_data["index"]
     q = quiz_data["questions"][index]
     question = f"**Question {index+1} of {len(quiz_data['questions'])}:**\n" + q["Question"]
     options = q["Options"]
@@ -57,7 +103,9 @@ def render_question(index):
             gr.update(visible=False),  # mcq_submit_btn
             gr.update(value=""),  # feedback
             gr.update(visible=False),  # flip
-            gr.update(visible=True)  # next
+            gr.update(visible=True),  # next
+            gr.update(visible=False),  # try_again
+            quiz_data
         )
     else:  # MCQ
         return (
@@ -69,12 +117,14 @@ def render_question(index):
             gr.update(visible=True),  # mcq_submit_btn
             gr.update(value=""),
             gr.update(visible=False),
-            gr.update(visible=False)
+            gr.update(visible=False),
+            gr.update(visible=False),
+            quiz_data
         )
 
-def submit_scq(option):
+def submit_scq(option, quiz_data):
     if option is None:
-        return gr.update(), "⚠️ Please select an option. Or, flip to reveal the answer.", gr.update(visible=False)
+        return gr.update(), "⚠️ Please select an option. Or, flip to reveal the answer.", gr.update(visible=False), quiz_data
 
     quiz_data["last_selected"] = option
     current_q = quiz_data["questions"][quiz_data["index"]]
@@ -86,15 +136,16 @@ def submit_scq(option):
     else:
         feedback = f"❌ Incorrect. You chose: {option}"
 
-    return gr.update(interactive=False), feedback, gr.update(visible=True)
+    return gr.update(interactive=False), feedback, gr.update(visible=True), quiz_data
 
-def submit_mcq(selected_options):
+def submit_mcq(selected_options, quiz_data):
     if not selected_options:
         return (
             gr.update(),  # leave checkbox state unchanged
             "⚠️ Please select at least one option.",
             gr.update(visible=False),
-            gr.update(visible=False)
+            gr.update(visible=False),
+            quiz_data
         )
 
     quiz_data["last_selected"] = selected_options
@@ -111,10 +162,11 @@ def submit_mcq(selected_options):
         gr.update(interactive=False),  # disable MCQ checkboxes
         feedback,
         gr.update(visible=True),  # flip button
-        gr.update(visible=True)   # next question button
+        gr.update(visible=True),   # next question button
+        quiz_data
     )
 
-def flip_to_show_answer():
+def flip_to_show_answer(quiz_data):
     current_q = quiz_data["questions"][quiz_data["index"]]
     correct_letters = set(current_q["Right_Option"].lower())
     correct_options = [
@@ -122,23 +174,26 @@ def flip_to_show_answer():
     ]
     return gr.update(value=f"✅ Correct answer(s): {', '.join(correct_options)}")
 
-def next_question():
+def next_question(quiz_data):
     quiz_data["index"] += 1
     if quiz_data["index"] >= len(quiz_data["questions"]):
         return (
-            gr.update(visible=True),  # input_form
-            gr.update(visible=False),  # flashcard
-            gr.update(value="🎉 Quiz complete! You can go back and try a new story."),
+            gr.update(visible=False),  # input_form
+            gr.update(visible=True),  # flashcard
+            gr.update(value="🎉 Quiz complete! Try again with new questions, or go back and try a new story."),
             gr.update(visible=False),
             gr.update(visible=False),
             gr.update(visible=False),
             gr.update(value=""),
             gr.update(visible=False),
-            gr.update(visible=False)
+            gr.update(visible=False),
+            gr.update(visible=True),  # try_again
+            quiz_data
         )
-    return render_question(quiz_data["index"])
+    return render_question(quiz_data)
 
-def go_back():
+def go_back(quiz_data):
+    # The story and any prefetched quiz are kept, so resubmitting it is instant
     quiz_data["questions"] = []
     quiz_data["index"] = 0
     quiz_data["answers"] = []
@@ -153,10 +208,15 @@ def go_back():
         gr.update(visible=False),
         gr.update(value=""),
         gr.update(visible=False),
-        gr.update(visible=True)
+        gr.update(visible=True),
+        gr.update(visible=False),
+        quiz_data
     )
 
 with gr.Blocks() as demo:
+    # Per-session quiz state; closing the tab releases the session's prefetch budget
+    quiz_state = gr.State(new_session_state(), delete_callback=lambda s: prefetcher.forget(s.get("session_id")))
+
     with gr.Column(visible=True) as input_form:
         topic_input = gr.Textbox(label="Enter quiz topic", placeholder="e.g. The King’s Monkey Servant")
         story_input = gr.Textbox(label="Enter a story", lines=10)
@@ -170,49 +230,41 @@ with gr.Blocks() as demo:
         feedback_text = gr.Markdown()
         flip_btn = gr.Button("Flip to show answer", visible=False)
         next_btn = gr.Button("Next Question", visible=True)
+        try_again_btn = gr.Button("Try again with new questions", visible=False)
         back_btn = gr.Button("Go back to story input", visible=True)
 
+    quiz_outputs = [
+        input_form, flashcard, question_text,
+        scq_options, mcq_options, mcq_submit_btn,
+        feedback_text, flip_btn, next_btn, try_again_btn,
+        quiz_state
+    ]
+
     submit_btn.click(
         generate_quiz,
-        inputs=[topic_input, story_input],
-        outputs=[
-            input_form, flashcard, question_text,
-            scq_options, mcq_options, mcq_submit_btn,
-            feedback_text, flip_btn, next_btn
-        ]
+        inputs=[topic_input, story_input, quiz_state],
+        outputs=quiz_outputs
     )
 
     scq_options.change(
         submit_scq,
-        inputs=scq_options,
-        outputs=[scq_options, feedback_text, flip_btn]
+        inputs=[scq_options, quiz_state],
+        outputs=[scq_options, feedback_text, flip_btn, quiz_state]
     )
 
     mcq_submit_btn.click(
         submit_mcq,
-        inputs=mcq_options,
-        outputs=[mcq_options, feedback_text, flip_btn, next_btn]
+        inputs=[mcq_options, quiz_state],
+        outputs=[mcq_options, feedback_text, flip_btn, next_btn, quiz_state]
     )
 
-    flip_btn.click(flip_to_show_answer, outputs=feedback_text)
+    flip_btn.click(flip_to_show_answer, inputs=quiz_state, outputs=feedback_text)
 
-    next_btn.click(
-        next_question,
-        outputs=[
-            input_form, flashcard, question_text,
-            scq_options, mcq_options, mcq_submit_btn,
-            feedback_text, flip_btn, next_btn
-        ]
-    )
+    next_btn.click(next_question, inputs=quiz_state, outputs=quiz_outputs)
 
-    back_btn.click(
-        go_back,
-        outputs=[
-            input_form, flashcard, question_text,
-            scq_options, mcq_options, mcq_submit_btn,
-            feedback_text, flip_btn, next_btn
-        ]
-    )
+    try_again_btn.click(try_again, inputs=quiz_state, outputs=quiz_outputs)
+
+    back_btn.click(go_back, inputs=quiz_state, outputs=quiz_outputs)
 
 if __name__ == "__main__":
     demo.launch()
@@ -0,0 +1,485 @@
+# backend/bench_pipeline.py
+# -*- coding: utf-8 -*-
+#
+# Offline benchmark suite for the quiz pipeline.
+#
+# Recorded Groq replies (bench/recorded_responses.json) are replayed through a
+# fake agent, so every stage can be timed without network access or API keys.
+# Run from the repo root (config.py reads backend/config/app_config.yaml):
+#
+#   python backend/bench_pipeline.py                      # compare against baseline
+#   python backend/bench_pipeline.py --scales 10,100      # quicker run
+#   python backend/bench_pipeline.py --update-baseline    # record a new baseline
+#   python backend/bench_pipeline.py --scaling --workers 1,2,4,8 --corpus 5000
+#                                     # post-processing throughput per process count
+#   python backend/bench_pipeline.py --pipelined --workers 1,2,4 --corpus 256 --latency 0.05
+#                                     # batch generation with post-processing overlapped
+
+import os
+import io
+import re
+import sys
+import copy
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+from itertools import cycle
+from types import SimpleNamespace
+
+import gspread
+
+import indic_quiz_generator_pipeline as pipeline
+import gurukula_quizgen as quizgen
+import ledger
+from grounding import GroundingIndex
+from checkpoints import ChapterCheckpoint
+from planner import RunStats
+from indic_quiz_generator_pipeline import (
+    QuizParser,
+    parse_quiz_reply,
+    deduplicate_questions,
+    run_parallel_quiz_with_mcq_retry,
+    run_packed_quizzes,
+)
+from postprocess import PostProcessPool
+from gurukula_quizgen import (
+    quiz_json_to_dataframe,
+    upload_to_sheet,
+    apply_conditional_formatting,
+)
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench")
+RECORDINGS_FILE = os.path.join(BENCH_DIR, "recorded_responses.json")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+
+# A single chapter measures call overhead more than work (and only one of the
+# recorded replies), so the smallest scale covers every recording several times.
+DEFAULT_SCALES = "10,100,10000"
+DEFAULT_REPEATS = 5
+# Runs per stage are capped so a scale times at most this many chapters in
+# total (and at least one run): a 10k-chapter run already averages out
+# scheduler noise, and five of them would take over an hour.
+REPEAT_CHAPTERS = 10000
+NUM_QUESTIONS = 15
+PACK_SIZE = 4  # chapters per request in the "generate_packed" stage
+
+BENCH_CHAPTER_TEXT = """\
+Chapter 16
+
+Kaṃsa summoned Pūtanā, the Rākṣhasī (राक्षसी), and ordered her to go through the villages and kill every newborn male child. Pūtanā took the form of a beautiful woman and entered Gokula. She went into the house of Nanda and Yaśhodā and took baby Kṛiṣhṇa on her lap. She had smeared poison on her breast and began to feed him. Kṛiṣhṇa sucked out her life along with the milk. Pūtanā screamed, took her true gigantic form and fell lifeless, crushing the trees for miles. The terrified Gopīs ran to the body; Yaśhodā and Rohiṇī picked Kṛiṣhṇa up from her chest and protected him with cow dung and the names of Viṣhṇu.
+
+The Gopas cut the huge body into pieces and burnt it. A sweet fragrance like aguru rose from the smoke, because her body had become pure when Kṛiṣhṇa drank her milk. This event is called Pūtanāmokṣha.
+
+When Kṛiṣhṇa was three months old, Yaśhodā celebrated the ceremony of his turning over. She placed the cradle under a cart and got busy with the guests. Śhakaṭāsura, a demon sent by Kaṃsa, was hiding in the cart. Crying for milk, Kṛiṣhṇa kicked the cart with his tiny feet. The cart turned over, its wheels broke and the pots of milk and curd were smashed. The boys playing nearby said that the baby had kicked the cart, but the elders did not believe them. Śhakaṭāsura had once been Utkacha, son of Hiraṇyākṣha, who was cursed by Sage Lomaśha for crushing the trees of his hermitage.
+
+One day Tṛṇāvarta came to Gokula as a whirlwind and carried Kṛiṣhṇa into the sky. Dust covered all of Gokula and the people could not see anything; they cried for the child. Kṛiṣhṇa became very heavy and held the demon's neck tightly until Tṛṇāvarta choked and fell dead on a rock.
+"""
+
+
+# ======== Recorded replies and fakes ========
+def load_recordings(path: str = RECORDINGS_FILE) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        recordings = json.load(f)
+
+    by_type = {"SCQ": [], "MCQ": []}
+    for rec in recordings:
+        by_type[rec["question_type"].upper()].append(rec["content"])
+    return by_type
+
+
+class FakeAgent:
+    """
+    Stands in for an agno Agent and replays recorded replies in a loop, after
+    `latency` seconds to stand in for the model's response time.
+    """
+
+    def __init__(self, recordings: dict, latency: float = 0.0):
+        self.replies = {qtype: cycle(contents) for qtype, contents in recordings.items()}
+        self.latency = latency
+
+    def run(self, prompt: str):
+        if self.latency:
+            time.sleep(self.latency)
+        qtype = "MCQ" if '"Question_type": MCQ' in prompt else "SCQ"
+        chapter_ids = re.findall(r"=== CHAPTER (\S+) ===", prompt)
+        if chapter_ids:  # packed prompt: one recorded quiz per chapter
+            chapters = {cid: parse_quiz_reply(next(self.replies[qtype]), qtype) for cid in chapter_ids}
+            return SimpleNamespace(content=json.dumps({"Chapters": chapters}, ensure_ascii=False))
+        return SimpleNamespace(content=next(self.replies[qtype]))
+
+
+class FakeRequest:
+    def __init__(self, result=None):
+        self.result = result or {}
+
+    def execute(self):
+        return self.result
+
+
+class FakeSheetsApi:
+    """Minimal `googleapiclient` Sheets v4 surface used by the publish path."""
+
+    def __init__(self, titles):
+        self.titles = titles
+
+    def spreadsheets(self):
+        return self
+
+    def get(self, spreadsheetId):
+        sheets = [{"properties": {"title": t, "sheetId": i}} for i, t in enumerate(self.titles)]
+        return FakeRequest({"sheets": sheets})
+
+    def batchUpdate(self, spreadsheetId, body):
+        return FakeRequest({"replies": [{} for _ in body["requests"]]})
+
+
+class FakeWorksheet:
+    def __init__(self, title, rows, cols):
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.values = []
+
+    def resize(self, rows=None, cols=None):
+        self.row_count = rows or self.row_count
+        self.col_count = cols or self.col_count
+
+    def clear(self):
+        self.values = []
+
+    def update(self, values):
+        self.values = values
+
+
+class FakeSpreadsheet:
+    id = "bench-spreadsheet"
+
+    def __init__(self):
+        self.worksheets = {}
+
+    def worksheet(self, title):
+        if title not in self.worksheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title, rows, cols):
+        self.worksheets[title] = FakeWorksheet(title, rows, cols)
+        return self.worksheets[title]
+
+
+@contextlib.contextmanager
+def offline_fakes(recordings: dict, agent_factory=None):
+    """
+    Patches the agent factory and Google clients for the duration of a run.
+    `agent_factory(model_id)` replaces the default FakeAgent over `recordings`.
+    """
+    agent_factory = agent_factory or (lambda model_id: FakeAgent(recordings))
+    spreadsheet = FakeSpreadsheet()
+    client = SimpleNamespace(open=lambda name: spreadsheet)
+    patches = [
+        (pipeline, "build_english_quiz_agent", lambda model_id, *args, **kwargs: agent_factory(model_id)),
+        (pipeline, "_routers", {}),
+        (ledger, "_ledger", None),  # keep benchmark calls out of the token ledger
+        (quizgen, "Credentials", SimpleNamespace(from_service_account_file=lambda *a, **kw: object())),
+        (quizgen, "gspread", SimpleNamespace(authorize=lambda creds: client, exceptions=gspread.exceptions)),
+        (quizgen, "build", lambda *a, **kw: FakeSheetsApi(list(spreadsheet.worksheets))),
+    ]
+    originals = [(mod, name, getattr(mod, name)) for mod, name, _ in patches]
+    try:
+        for mod, name, value in patches:
+            setattr(mod, name, value)
+        yield
+    finally:
+        for mod, name, value in originals:
+            setattr(mod, name, value)
+
+
+# ======== Stages ========
+# Each stage is prepared once per scale (untimed) and returns a callable that
+# processes a single chapter; the callable is then timed over `n` chapters.
+
+def prepare_parse(recordings):
+    parser = QuizParser()
+    replies = cycle(list(zip(recordings["SCQ"], recordings["MCQ"])))
+
+    def step(i):
+        scq_reply, mcq_reply = next(replies)
+        parser.run(scq_reply)
+        parser.run(mcq_reply)
+    return step
+
+
+def prepare_parse_reply(recordings):
+    # JSON-mode fast path with QuizParser as fallback
+    replies = cycle(list(zip(recordings["SCQ"], recordings["MCQ"])))
+
+    def step(i):
+        scq_reply, mcq_reply = next(replies)
+        parse_quiz_reply(scq_reply, "SCQ")
+        parse_quiz_reply(mcq_reply, "MCQ")
+    return step
+
+
+def prepare_dedup(recordings):
+    parser = QuizParser()
+    scq = parser.run(recordings["SCQ"][0])["Questions"]
+    mcq = parser.run(recordings["MCQ"][0])["Questions"]
+
+    def step(i):
+        deduplicate_questions(scq, mcq)
+    return step
+
+
+def prepare_grounding(recordings):
+    # Index build plus scoring of one chapter's questions; new text per chapter
+    # so the per-chapter index cache does not hide the build cost.
+    questions = parse_quiz_reply(recordings["SCQ"][0], "SCQ")["Questions"] + \
+        parse_quiz_reply(recordings["MCQ"][0], "MCQ")["Questions"]
+
+    def step(i):
+        index = GroundingIndex(f"{BENCH_CHAPTER_TEXT}\n{i}")
+        for q in questions:
+            index.score(q)
+    return step
+
+
+def prepare_generate(recordings):
+    def step(i):
+        run_parallel_quiz_with_mcq_retry(BENCH_CHAPTER_TEXT, NUM_QUESTIONS)
+    return step
+
+
+def prepare_generate_packed(recordings):
+    # Same chapters as "generate", PACK_SIZE to a request; timed per chapter
+    chapters = {}
+
+    def flush():
+        if chapters:
+            run_packed_quizzes(dict(chapters))
+            chapters.clear()
+
+    def step(i):
+        chapters[f"chapter{i}"] = (BENCH_CHAPTER_TEXT, NUM_QUESTIONS)
+        if len(chapters) == PACK_SIZE:
+            flush()
+    step.flush = flush  # the last, partial pack is timed too
+    return step
+
+
+def prepare_dataframe(recordings):
+    quiz = run_parallel_quiz_with_mcq_retry(BENCH_CHAPTER_TEXT, NUM_QUESTIONS)["Quiz"]
+
+    def step(i):
+        quiz_json_to_dataframe(quiz)
+    return step
+
+
+def prepare_publish(recordings):
+    quiz = run_parallel_quiz_with_mcq_retry(BENCH_CHAPTER_TEXT, NUM_QUESTIONS)["Quiz"]
+    df = quiz_json_to_dataframe(quiz)
+
+    def step(i):
+        # A spreadsheet holds at most a couple of hundred chapter tabs; reuse them
+        # so the fake's per-call tab listing does not dominate large scales.
+        chapter_title = f"chapter{i % 200}"
+        spreadsheet_id, creds = upload_to_sheet(df, chapter_title)
+        apply_conditional_formatting(spreadsheet_id, chapter_title, df, creds)
+    return step
+
+
+STAGES = {
+    "parse": prepare_parse,
+    "parse_reply": prepare_parse_reply,
+    "dedup": prepare_dedup,
+    "grounding": prepare_grounding,
+    "generate": prepare_generate,
+    "generate_packed": prepare_generate_packed,
+    "dataframe": prepare_dataframe,
+    "publish": prepare_publish,
+}
+
+
+def time_stage(prepare, recordings, n: int, repeats: int = DEFAULT_REPEATS) -> float:
+    """
+    Returns the wall time per chapter in microseconds: the best of `repeats`
+    runs over `n` chapters, so scheduler and GC noise does not count.
+    """
+    best = None
+    for _ in range(repeats):
+        step = prepare(recordings)
+        start = time.perf_counter()
+        for i in range(n):
+            step(i)
+        if hasattr(step, "flush"):
+            step.flush()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / n * 1e6
+
+
+def run_benchmarks(stages, scales, recordings, repeats: int = DEFAULT_REPEATS) -> dict:
+    results = {}
+    with offline_fakes(recordings):
+        for stage in stages:
+            results[stage] = {}
+            for n in scales:
+                # The pipeline prints progress for every chapter; keep it out of the timings.
+                runs = max(1, min(repeats, REPEAT_CHAPTERS // n))
+                with contextlib.redirect_stdout(io.StringIO()):
+                    us = time_stage(STAGES[stage], recordings, n, runs)
+                results[stage][str(n)] = round(us, 1)
+                print(f"⏱️  {stage:<10} {n:>6} chapters: {us:>12.1f} µs/chapter")
+    return results
+
+
+# ======== Process-pool scaling ========
+def run_scaling(recordings: dict, workers: list, corpus: int, chunk_size: int) -> dict:
+    """
+    Finalizes and tabulates `corpus` chapters (one recorded SCQ and MCQ reply
+    each) through PostProcessPool, once per worker count: the passes a batch
+    run with --workers sends to the pool. Replies are parsed up front, outside
+    the timing, as generation threads parse them inline.
+    """
+    scq_replies, mcq_replies = cycle(recordings["SCQ"]), cycle(recordings["MCQ"])
+    targets = {"SCQ": NUM_QUESTIONS // 2 + NUM_QUESTIONS % 2, "MCQ": NUM_QUESTIONS // 2}
+    selections = []
+    for _ in range(corpus):
+        scq, mcq = parse_quiz_reply(next(scq_replies), "SCQ"), parse_quiz_reply(next(mcq_replies), "MCQ")
+        selections.append((scq.get("Questions", []), mcq.get("Questions", []), targets))
+
+    results, base = {}, None
+    for n in workers:
+        with PostProcessPool(n, chunk_size) as pool, contextlib.redirect_stdout(io.StringIO()):
+            pool.warm_up()
+            start = time.perf_counter()
+            finalized = pool.finalize_many(copy.deepcopy(selections))
+            pool.tables_many([questions for questions, _ in finalized])
+            elapsed = time.perf_counter() - start
+        rate = corpus / elapsed
+        base = base or rate
+        results[str(n)] = {"chapters_per_s": round(rate, 1), "speedup": round(rate / base, 2)}
+        print(f"🧮 {n:>3} worker(s): {rate:>10.1f} chapters/s  ({rate / base:.2f}x)")
+    print(f"   {corpus} chapters, chunks of {chunk_size}, {os.cpu_count()} CPU(s)")
+    return results
+
+
+def run_pipelined(recordings: dict, workers: list, corpus: int, chunk_size: int, latency: float) -> dict:
+    """
+    Generates `corpus` chapters the way a batch run with --workers does
+    (generate_chapters_ahead), once per worker count, with every model call
+    taking `latency` seconds. With more than one worker each window is
+    finalized on the pool while the next window's calls run.
+    """
+    results, base = {}, None
+    for n in workers:
+        with tempfile.TemporaryDirectory() as state_dir, \
+                offline_fakes(recordings, lambda model_id: FakeAgent(recordings, latency)), \
+                PostProcessPool(n, chunk_size) as pool, contextlib.redirect_stdout(io.StringIO()):
+            chapters = [(f"chapter{i}", BENCH_CHAPTER_TEXT, NUM_QUESTIONS,
+                         ChapterCheckpoint(state_dir, f"chapter{i}", {"chapter": i})) for i in range(corpus)]
+            original_stats = quizgen._run_stats
+            quizgen._run_stats = RunStats(os.path.join(state_dir, "run_stats.json"))
+            pipeline.configure_postprocess(pool if pool.workers > 1 else None)
+            try:
+                pool.warm_up()
+                start = time.perf_counter()
+                quizgen.generate_chapters_ahead(chapters, pool)
+                elapsed = time.perf_counter() - start
+            finally:
+                pipeline.configure_postprocess(None)
+                quizgen._run_stats = original_stats
+        rate = corpus / elapsed
+        base = base or rate
+        results[str(n)] = {"chapters_per_s": round(rate, 1), "speedup": round(rate / base, 2)}
+        print(f"🧮 {n:>3} worker(s): {rate:>10.1f} chapters/s  ({rate / base:.2f}x)")
+    print(f"   {corpus} chapters, {latency * 1000:.0f} ms per model call, chunks of {chunk_size}, "
+          f"{os.cpu_count()} CPU(s)")
+    return results
+
+
+# ======== Baseline comparison ========
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float, noise_floor: float = 0.0) -> list:
+    """Stages slower than the baseline by more than `tolerance` and by more than `noise_floor` µs."""
+    regressions = []
+    for stage, scales in results.items():
+        for n, us in scales.items():
+            base = baseline.get(stage, {}).get(n)
+            if base is None:
+                print(f"➖ {stage} @ {n}: no baseline")
+                continue
+            change = (us - base) / base if base else 0.0
+            regressed = change > tolerance and us - base > noise_floor
+            marker = "❌" if regressed else "✅"
+            print(f"{marker} {stage:<10} {n:>6}: {base:>12.1f} → {us:>12.1f} µs/chapter ({change:+.1%})")
+            if regressed:
+                regressions.append((stage, n, base, us))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the quiz pipeline.")
+    parser.add_argument("--scales", type=str, default=DEFAULT_SCALES, help=f"Comma-separated chapter counts (default: {DEFAULT_SCALES})")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Runs per stage and scale, fewer at large scales; the fastest counts")
+    parser.add_argument("--stages", type=str, default=",".join(STAGES), help="Comma-separated stages to run")
+    parser.add_argument("--baseline", type=str, default=BASELINE_FILE, help="Baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging a regression (0.25 = 25%%)")
+    parser.add_argument("--noise-floor", type=float, default=200.0, help="Slowdowns smaller than this many µs/chapter are never flagged")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--recordings", type=str, default=RECORDINGS_FILE, help="Recorded replies to replay")
+    parser.add_argument("--scaling", action="store_true", help="Only measure post-processing throughput per worker count")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Only measure batch generation per worker count, with --latency per model call")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per simulated model call for --pipelined")
+    parser.add_argument("--workers", type=str, default="1,2,4", help="Comma-separated process counts for --scaling/--pipelined")
+    parser.add_argument("--corpus", type=int, default=2000, help="Chapters in the --scaling/--pipelined corpus")
+    parser.add_argument("--chunk-size", type=int, default=16, help="Items per process-pool chunk for --scaling/--pipelined")
+    args = parser.parse_args(argv)
+
+    if args.scaling or args.pipelined:
+        workers = [int(w) for w in args.workers.split(",") if w.strip()]
+        if args.pipelined:
+            run_pipelined(load_recordings(args.recordings), workers, args.corpus, args.chunk_size, args.latency)
+        else:
+            run_scaling(load_recordings(args.recordings), workers, args.corpus, args.chunk_size)
+        return 0
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"Unknown stage(s): {', '.join(unknown)}")
+
+    recordings = load_recordings(args.recordings)
+    results = run_benchmarks(stages, scales, recordings, args.repeats)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        for stage, values in results.items():
+            baseline.setdefault(stage, {}).update(values)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"✅ Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠️ No baseline at {args.baseline}; run with --update-baseline first.")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = compare_to_baseline(results, baseline, args.tolerance, args.noise_floor)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}.")
+        return 1
+    print("✅ No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
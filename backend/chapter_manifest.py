@@ -0,0 +1,85 @@
+# backend/chapter_manifest.py
+
+import os
+import json
+import fcntl
+import hashlib
+import tempfile
+from datetime import datetime, timezone
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def fingerprint_key(fingerprint: dict) -> str:
+    """Stable short key for a chapter fingerprint (see ChapterManifest.fingerprint)."""
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def write_json_atomic(path: str, data):
+    """Writes JSON to a temp file in the same directory and renames it over `path`."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ChapterManifest:
+    """
+    Records what was last published for each chapter (content hash, question
+    count, model ids, prompt version, sheet revision), so batch runs can skip
+    chapters whose inputs have not changed.
+    """
+
+    def __init__(self, path: str, generation_settings: dict):
+        self.path = path
+        # Everything besides the chapter itself that affects the generated quiz
+        self.generation_settings = generation_settings
+        self.entries = self._read()
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f).get("chapters", {})
+
+    def fingerprint(self, chapter_text: str, num_questions: int) -> dict:
+        return {
+            "content_hash": content_hash(chapter_text),
+            "num_questions": num_questions,
+            **self.generation_settings,
+        }
+
+    def is_unchanged(self, chapter_title: str, chapter_text: str, num_questions: int) -> bool:
+        entry = self.entries.get(chapter_title)
+        if not entry or not entry.get("published_at"):
+            return False
+        expected = self.fingerprint(chapter_text, num_questions)
+        return all(entry.get(key) == value for key, value in expected.items())
+
+    def record(self, chapter_title: str, chapter_text: str, num_questions: int, sheet_revision=None):
+        entry = {
+            **self.fingerprint(chapter_text, num_questions),
+            "sheet_revision": sheet_revision,
+            "published_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        # Several workers may share the data folder: merge into the latest file
+        # under an exclusive lock instead of overwriting it with our copy.
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.entries = self._read()
+            self.entries[chapter_title] = entry
+            self.save()
+
+    def save(self):
+        write_json_atomic(self.path, {"chapters": self.entries})
@@ -0,0 +1,111 @@
+# backend/checkpoints.py
+
+import os
+import json
+from datetime import datetime, timezone
+
+from chapter_manifest import write_json_atomic, fingerprint_key
+from ledger import new_run_id
+
+STAGES = ("generated", "translated", "parsed", "published")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class ChapterCheckpoint:
+    """
+    Per-chapter, per-stage checkpoints under `<state_dir>/<chapter_title>/<stage>.json`.
+    Each file carries a key derived from the chapter fingerprint (text, question
+    count, models, prompt version), so edits to any of those invalidate it.
+    """
+
+    def __init__(self, state_dir: str, chapter_title: str, fingerprint: dict):
+        self.directory = os.path.join(state_dir, chapter_title)
+        self.key = fingerprint_key(fingerprint)
+
+    def path(self, stage: str) -> str:
+        if stage not in STAGES:
+            raise ValueError(f"Unknown checkpoint stage: {stage}")
+        return os.path.join(self.directory, f"{stage}.json")
+
+    def load(self, stage: str):
+        path = self.path(stage)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except json.JSONDecodeError:
+            return None
+        return saved["data"] if saved.get("key") == self.key else None
+
+    def save(self, stage: str, data):
+        write_json_atomic(self.path(stage), {"key": self.key, "saved_at": _now(), "data": data})
+
+    def clear(self):
+        """Drops every stage, so the next run regenerates the chapter from scratch."""
+        for stage in STAGES:
+            if os.path.exists(self.path(stage)):
+                os.remove(self.path(stage))
+
+
+class BatchRunState:
+    """
+    Status of every chapter in the current batch run (`<state_dir>/run.json`),
+    so `--resume` can continue with the chapters that were not finished.
+    Stage checkpoints are reused by any later run while the chapter fingerprint
+    matches; callers clear them only when a run is forced.
+    """
+
+    def __init__(self, state_dir: str, data: dict):
+        self.path = os.path.join(state_dir, "run.json")
+        self.data = data
+
+    @classmethod
+    def start(cls, state_dir: str, chapter_titles: list) -> "BatchRunState":
+        state = cls(state_dir, {
+            "run_id": new_run_id(),
+            "started_at": _now(),
+            "chapters": {title: {"status": "pending", "attempts": 0} for title in chapter_titles},
+        })
+        state.save()
+        return state
+
+    @classmethod
+    def resume(cls, state_dir: str, chapter_titles: list) -> "BatchRunState":
+        path = os.path.join(state_dir, "run.json")
+        if not os.path.exists(path):
+            print("⚠️ No previous run to resume; starting a new one.")
+            return cls.start(state_dir, chapter_titles)
+        with open(path, "r", encoding="utf-8") as f:
+            state = cls(state_dir, json.load(f))
+        state.data.setdefault("run_id", new_run_id())
+        # Chapters added since the interrupted run are picked up as well
+        for title in chapter_titles:
+            state.data["chapters"].setdefault(title, {"status": "pending", "attempts": 0})
+        state.save()
+        return state
+
+    @property
+    def run_id(self) -> str:
+        # Shared by the original run and its resumes, so the ledger totals them together
+        return self.data["run_id"]
+
+    def pending(self) -> list:
+        return [title for title, entry in self.data["chapters"].items() if entry["status"] != "done"]
+
+    def mark(self, chapter_title: str, status: str, error: str = None):
+        entry = self.data["chapters"].setdefault(chapter_title, {"status": "pending", "attempts": 0})
+        entry["status"] = status
+        entry["updated_at"] = _now()
+        if status == "failed":
+            entry["attempts"] += 1
+            entry["error"] = error
+        else:
+            entry.pop("error", None)
+        self.save()
+
+    def save(self):
+        write_json_atomic(self.path, self.data)
@@ -0,0 +1,117 @@
+# backend/grounding.py
+
+import re
+import math
+import unicodedata
+from functools import lru_cache
+
+# Words that carry no evidence either way ("Which of the following ..." etc.)
+STOPWORDS = frozenset("""
+a an the and or but not no of to in on at by for from with as is are was were be been being am
+do does did has have had it its this that these those he she they him her them his their who whom
+whose which what when where why how than then there here so such all any both each few more most
+other some only own same too very can will would should could may might must shall into about
+after before during while until again further once following true false correct incorrect option
+options statement statements question answer passage chapter according above below none one
+""".split())
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?।॥])\s+|\n+")
+# \w misses Devanagari vowel signs and viramas (combining marks), which would split
+# राक्षसी into fragments; the block is added except for the danda punctuation ।॥.
+TOKEN_PATTERN = re.compile(r"[\w\u0900-\u0963\u0966-\u097F]+")
+OPTION_LABEL = re.compile(r"^[a-dA-D]\.\s*")
+WINDOW_SENTENCES = 3
+
+
+def fold_iast(text: str) -> str:
+    """
+    Lowercases and strips diacritics from Latin letters, so IAST and plain
+    spellings match (Kṛiṣhṇa, Krishna -> krishna). Devanagari is left intact:
+    its vowel signs are combining marks too, but dropping them changes the word.
+    """
+    folded = []
+    for ch in unicodedata.normalize("NFKD", text):
+        if unicodedata.combining(ch) and folded and folded[-1] < "ɐ":
+            continue
+        folded.append(ch)
+    return "".join(folded).lower()
+
+
+def _stem(token: str) -> str:
+    # Just enough to match "demons" with "demon" and "killed" with "kill"
+    if token.isascii() and len(token) > 4:
+        for suffix in ("ing", "ed", "es", "s"):
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> list:
+    return [_stem(t) for t in TOKEN_PATTERN.findall(fold_iast(text)) if t not in STOPWORDS and len(t) > 1]
+
+
+class GroundingIndex:
+    """
+    Inverted index over a chapter's sentences. Scores how much lexical support
+    a question and its correct option(s) have in the passage, so questions the
+    passage cannot answer are caught before publishing, without a judge model.
+    """
+
+    def __init__(self, chapter_text: str):
+        sentences = [s for s in SENTENCE_SPLIT.split(chapter_text) if s.strip()]
+        self.num_sentences = max(1, len(sentences))
+        self.postings = {}
+        for i, sentence in enumerate(sentences):
+            for token in set(tokenize(sentence)):
+                self.postings.setdefault(token, set()).add(i)
+
+    def weight(self, token: str) -> float:
+        # Rare words count for more; words not in the chapter get the highest weight
+        df = len(self.postings.get(token, ()))
+        return math.log(1 + self.num_sentences / (1 + df)) + 1
+
+    def coverage(self, tokens: set) -> float:
+        if not tokens:
+            return 1.0
+        total = sum(self.weight(t) for t in tokens)
+        return sum(self.weight(t) for t in tokens if t in self.postings) / total
+
+    def locality(self, tokens: set) -> float:
+        """Best weighted overlap of `tokens` with any window of nearby sentences."""
+        if not tokens:
+            return 1.0
+        hits = {}
+        for token in tokens:
+            for i in self.postings.get(token, ()):
+                for start in range(max(0, i - WINDOW_SENTENCES + 1), i + 1):
+                    hits.setdefault(start, set()).add(token)
+        if not hits:
+            return 0.0
+        total = sum(self.weight(t) for t in tokens)
+        return max(sum(self.weight(t) for t in found) for found in hits.values()) / total
+
+    def score(self, question: dict) -> dict:
+        """
+        `answer`: share of the correct option's words found in the chapter.
+        `locality`: share of question + answer words found together within a
+        few sentences. `support` is the lower of the two.
+        """
+        options = question.get("Options") or []
+        right = question.get("Right_Option") or ""
+        answer_text = " ".join(
+            OPTION_LABEL.sub("", options[ord(letter) - ord("a")])
+            for letter in right.replace(" ", "").lower()
+            if "a" <= letter <= "d" and ord(letter) - ord("a") < len(options)
+            and isinstance(options[ord(letter) - ord("a")], str)
+        )
+        answer_tokens = set(tokenize(answer_text))
+        all_tokens = set(tokenize(question.get("Question") or "")) | answer_tokens
+        answer = self.coverage(answer_tokens)
+        locality = self.locality(all_tokens)
+        return {"answer": round(answer, 3), "locality": round(locality, 3), "support": round(min(answer, locality), 3)}
+
+
+@lru_cache(maxsize=8)
+def get_grounding_index(chapter_text: str) -> GroundingIndex:
+    """Built once per chapter and shared by the SCQ and MCQ threads."""
+    return GroundingIndex(chapter_text)
@@ -2,7 +2,11 @@
 # -*- coding: utf-8 -*-
 
 import os
+import copy
+import time
+import socket
 import argparse
+import threading
 import re
 import pandas as pd
 import gspread
@@ -14,44 +18,142 @@ from dotenv import load_dotenv; load_dotenv()
 from config import env_config, app_config
 from indic_quiz_generator_pipeline import (
     run_parallel_quiz_with_mcq_retry,
+    generate_quiz_parts,
+    submit_assembly,
+    run_packed_quizzes,
+    configure_routing,
+    configure_grounding,
+    configure_postprocess,
+    GROUNDING_SETTINGS,
+    build_english_quiz_agent,
+    MODEL_ROUTES,
+    PROMPT_VERSION,
 )
-from utils.gsheets import clear_all_sheet_formatting_only
+from chapter_manifest import ChapterManifest, MANIFEST_FILENAME, fingerprint_key
+from checkpoints import ChapterCheckpoint, BatchRunState
+from work_queue import WorkQueue, LeaseLostError
+from translation import TranslationMemory, translate_quiz
+from planner import RunStats, configure_planning, suggest_question_count
+from ledger import configure_ledger, ledger_context, new_run_id, record_chapter
+from question_bank import write_question_bank
+from postprocess import PostProcessPool
+from utils.gsheets import clear_all_sheet_formatting_only, get_spreadsheet_revision
 
 SERVICE_ACCOUNT_FILE = env_config["SERVICE_ACCOUNT_FILE"]
 GOOGLE_SCOPES = env_config["GOOGLE_SCOPES"]
 SPREADSHEET_NAME = app_config["spreadsheet"]["name"]
+DATA_FOLDER = "data"
+BATCH_CONFIG = app_config.get("batch", {})
+STATE_DIR = BATCH_CONFIG.get("state_dir", ".quizgen_state")
+MAX_ATTEMPTS = BATCH_CONFIG.get("max_attempts", 3)
+RETRY_BACKOFF_SECONDS = BATCH_CONFIG.get("retry_backoff_seconds", 5)
+QUEUE_CONFIG = app_config.get("work_queue", {})
+TRANSLATION_CONFIG = app_config.get("translation", {})
+TRANSLATION_LANGUAGES = TRANSLATION_CONFIG.get("languages") or {}
+PLANNING_CONFIG = app_config.get("planning", {})
+PACKING_CONFIG = app_config.get("packing", {})
+POSTPROCESS_CONFIG = app_config.get("postprocess", {})
+QUESTION_BANK_PATH = app_config.get("question_bank", {}).get("path", os.path.join(DATA_FOLDER, "question_bank.qbank"))
+
+routing_config = app_config.get("routing", {})
+configure_routing(routing_config.get("settings"), routing_config.get("models"))
+configure_grounding(app_config.get("generation", {}).get("grounding"))
+configure_planning(PLANNING_CONFIG.get("settings"))
+configure_ledger(app_config.get("ledger", {}).get("path", os.path.join(DATA_FOLDER, "token_ledger.jsonl")))
 
 # ======== STEP 1: Run Agent and Get JSON ========
+def use_structured_output() -> bool:
+    return app_config.get("generation", {}).get("structured_output", True)
+
+_translation_memory = None
+
+def get_translation_memory() -> TranslationMemory:
+    global _translation_memory
+    if _translation_memory is None:
+        _translation_memory = TranslationMemory(
+            TRANSLATION_CONFIG.get("memory_path", os.path.join(DATA_FOLDER, "translation_memory.json"))
+        )
+    return _translation_memory
+
+_run_stats = None
+
+def get_run_stats():
+    """Yield history for request planning, or None when planning is turned off."""
+    global _run_stats
+    if not PLANNING_CONFIG.get("enabled", True):
+        return None
+    if _run_stats is None:
+        _run_stats = RunStats(PLANNING_CONFIG.get("stats_path", os.path.join(DATA_FOLDER, "run_stats.json")))
+    return _run_stats
+
+def get_question_count(chapter_title: str, chapter_text: str, quiz_counts: dict = None) -> int:
+    # Explicit counts in app_config win; other chapters are sized from their length
+    quiz_counts = app_config.get("chapter_question_counts", {}) if quiz_counts is None else quiz_counts
+    if chapter_title.lower() in quiz_counts:
+        return quiz_counts[chapter_title.lower()]
+    if not PLANNING_CONFIG.get("enabled", True):
+        return 15
+    return suggest_question_count(chapter_text)
+
 def generate_quiz_json(chapter_text: str, num_questions: int = 15) -> dict:
-    quiz = run_parallel_quiz_with_mcq_retry(chapter_text, num_questions)
+    structured = use_structured_output()
+    quiz = run_parallel_quiz_with_mcq_retry(chapter_text, num_questions, structured=structured,
+                                            run_stats=get_run_stats())
+    return finish_quiz_json(quiz)
 
+def finish_quiz_json(quiz: dict) -> dict:
     # Flatten to match old format: {'Questions': [...]}
     return {
         "Topic": quiz["Quiz"]["Topic"],
         "Questions": quiz["Quiz"]["Questions"]
     }
 
+def translate_quiz_json(quiz_json: dict) -> dict:
+    """
+    Copy of the English quiz with the configured translations added. Kept apart
+    from generation, so a failed translation never costs the generated quiz.
+    """
+    if not TRANSLATION_LANGUAGES:
+        return quiz_json
+    agent = build_english_quiz_agent(TRANSLATION_CONFIG.get("model", "llama-3.3-70b-versatile"), structured=True)
+    return translate_quiz(copy.deepcopy(quiz_json), TRANSLATION_LANGUAGES, get_translation_memory(), agent)
+
+def parsing_stage() -> str:
+    """Checkpoint stage the sheet table is built from."""
+    return "translated" if TRANSLATION_LANGUAGES else "generated"
+
 # ======== STEP 2: Convert to DataFrame ========
 def clean_option(opt: str) -> str:
     return re.sub(r'^[a-d]\.\s*', '', opt.strip(), flags=re.IGNORECASE)
 
+def question_to_row(q: dict) -> dict:
+    row = {
+        "Chapter": q["Chapter"],
+        "Timer": q["Timer"],
+        "Points": q["Number_Of_Points_Earned"],
+        "Type": "SCQ" if (q["Question_type"] == "MCQ" and len(q["Right_Option"].replace(" ", "")) == 1) else q["Question_type"],
+        "Question": q["Question"].strip() + "?" if not q["Question"].strip().endswith("?") else q["Question"].strip(),
+        "Option A": clean_option(q["Options"][0]) if len(q["Options"]) > 0 else "",
+        "Option B": clean_option(q["Options"][1]) if len(q["Options"]) > 1 else "",
+        "Option C": clean_option(q["Options"][2]) if len(q["Options"]) > 2 else "",
+        "Option D": clean_option(q["Options"][3]) if len(q["Options"]) > 3 else "",
+        "Right Answer": q["Right_Option"].replace(" ", "").lower()
+    }
+
+    # Per-language columns go after "Right Answer", e.g. "Question (hi)", "Option A (hi)"
+    for language, translated in q.get("Translations", {}).items():
+        row[f"Question ({language})"] = translated.get("Question", "")
+        options = translated.get("Options", [])
+        for idx, letter in enumerate("ABCD"):
+            row[f"Option {letter} ({language})"] = options[idx] if len(options) > idx else ""
+
+    return row
+
 def quiz_json_to_dataframe(quiz_json: dict) -> pd.DataFrame:
     questions = quiz_json['Questions']
     return pd.DataFrame(
-        {
-            "Chapter": q["Chapter"],
-            "Timer": q["Timer"],
-            "Points": q["Number_Of_Points_Earned"],
-            "Type": "SCQ" if (q["Question_type"] == "MCQ" and len(q["Right_Option"].replace(" ", "")) == 1) else q["Question_type"],
-            "Question": q["Question"].strip() + "?" if not q["Question"].strip().endswith("?") else q["Question"].strip(),
-            "Option A": clean_option(q["Options"][0]) if len(q["Options"]) > 0 else "",
-            "Option B": clean_option(q["Options"][1]) if len(q["Options"]) > 1 else "",
-            "Option C": clean_option(q["Options"][2]) if len(q["Options"]) > 2 else "",
-            "Option D": clean_option(q["Options"][3]) if len(q["Options"]) > 3 else "",
-            "Right Answer": q["Right_Option"].replace(" ", "").lower()
-        }
-        for q in questions
-    ).sample(frac=1, random_state=42).reset_index(drop=True)
+        question_to_row(q) for q in questions
+    ).fillna("").sample(frac=1, random_state=42).reset_index(drop=True)
 
 # ======== STEP 3: Upload to Google Sheet ========
 def upload_to_sheet(df: pd.DataFrame, chapter_title: str):
@@ -60,11 +162,16 @@ def upload_to_sheet(df: pd.DataFrame, chapter_title: str):
 
     spreadsheet = client.open(SPREADSHEET_NAME)
 
+    # Header row plus one row per question; translated quizzes add columns per language
+    rows, cols = len(df) + 1, len(df.columns)
+
     # Check if sheet with chapter_title exists, else create it
     try:
         worksheet = spreadsheet.worksheet(chapter_title)
+        if worksheet.row_count < rows or worksheet.col_count < cols:
+            worksheet.resize(rows=max(rows, worksheet.row_count), cols=max(cols, worksheet.col_count))
     except gspread.exceptions.WorksheetNotFound:
-        worksheet = spreadsheet.add_worksheet(title=chapter_title, rows=100, cols=20)
+        worksheet = spreadsheet.add_worksheet(title=chapter_title, rows=rows, cols=cols)
 
     worksheet.clear()
 
@@ -97,9 +204,9 @@ def apply_conditional_formatting(spreadsheet_id: str, chapter_title: str, df: pd
     requests = []
 
     # Iterate through each question row (skipping header)
-    for i, row in enumerate(df.itertuples(index=False), start=1):
+    for i, right_answer in enumerate(df["Right Answer"], start=1):
         # SCQ: 'c', MCQ: 'bd', etc.
-        correct_options = str(row[-1]).strip().lower()
+        correct_options = str(right_answer).strip().lower()
 
         for letter, col_idx in option_columns.items():
             is_correct = letter in correct_options
@@ -139,60 +246,463 @@ def process_chapter_to_sheet(
     chapter_path: str,
     chapter_title: str,
     num_questions: int,
-    quiz_generator_fn=generate_quiz_json
+    quiz_generator_fn=generate_quiz_json,
+    manifest: ChapterManifest = None,
+    checkpoint: ChapterCheckpoint = None,
+    before_publish=None
 ):
     print(f"📘 Reading File: {chapter_path} ...")
     with open(chapter_path, "r", encoding="utf-8") as f:
         chapter_text = f.read()
 
-    print(f"📘 Processing: {chapter_title} with {num_questions} questions...")
-    quiz_json = quiz_generator_fn(chapter_text, num_questions)
-    print(f"✅ Quiz Generated: {chapter_title}")
-
-    df = quiz_json_to_dataframe(quiz_json)
+    # Each stage is checkpointed so a failure later on never re-spends tokens
+    quiz_json = checkpoint.load("generated") if checkpoint else None
+    if quiz_json is None:
+        print(f"📘 Processing: {chapter_title} with {num_questions} questions...")
+        with ledger_context(chapter=chapter_title):
+            started = time.monotonic()
+            quiz_json = quiz_generator_fn(chapter_text, num_questions)
+            record_chapter(len(quiz_json["Questions"]), time.monotonic() - started)
+        if checkpoint:
+            checkpoint.save("generated", quiz_json)
+        print(f"✅ Quiz Generated: {chapter_title}")
+    else:
+        print(f"♻️ Reusing generated quiz for {chapter_title}")
+
+    if TRANSLATION_LANGUAGES:
+        translated = checkpoint.load("translated") if checkpoint else None
+        if translated is None:
+            with ledger_context(chapter=chapter_title):
+                quiz_json = translate_quiz_json(quiz_json)
+            if checkpoint:
+                checkpoint.save("translated", quiz_json)
+            print(f"✅ Quiz Translated: {chapter_title}")
+        else:
+            quiz_json = translated
+
+    table = checkpoint.load("parsed") if checkpoint else None
+    if table is None:
+        df = quiz_json_to_dataframe(quiz_json)
+        if checkpoint:
+            checkpoint.save("parsed", {"columns": df.columns.tolist(), "rows": df.values.tolist()})
+    else:
+        df = pd.DataFrame(table["rows"], columns=table["columns"])
+
+    published = checkpoint.load("published") if checkpoint else None
+    if published is None:
+        if before_publish is not None:
+            before_publish()  # e.g. raises LeaseLostError if another worker owns the chapter now
+        spreadsheet_id, creds = upload_to_sheet(df, chapter_title)
+        apply_conditional_formatting(spreadsheet_id, chapter_title, df, creds)
+        published = {"spreadsheet_id": spreadsheet_id, "sheet_revision": get_spreadsheet_revision(spreadsheet_id, creds)}
+        if checkpoint:
+            checkpoint.save("published", published)
+    else:
+        print(f"♻️ {chapter_title} was already published")
 
-    spreadsheet_id, creds = upload_to_sheet(df, chapter_title)
-    apply_conditional_formatting(spreadsheet_id, chapter_title, df, creds)
+    if manifest is not None:
+        manifest.record(chapter_title, chapter_text, num_questions, published["sheet_revision"])
     print(f"✅ Done: {chapter_title}\n")
 
-    return spreadsheet_id  # Optional return
+    return published["spreadsheet_id"]  # Optional return
+
+# ======== Change Detection ========
+def load_manifest(data_folder: str = DATA_FOLDER) -> ChapterManifest:
+    generation_settings = {
+        "models": {qtype: list(models) for qtype, models in MODEL_ROUTES.items()},
+        "prompt_version": PROMPT_VERSION,
+        "structured_output": use_structured_output(),
+        "grounding_min_support": GROUNDING_SETTINGS["min_support"],
+        "languages": sorted(TRANSLATION_LANGUAGES),
+    }
+    return ChapterManifest(os.path.join(data_folder, MANIFEST_FILENAME), generation_settings)
 
 # ======== Processing Single Chapter ========
 def run_single_quiz_pipeline(chapter_title: str, ):
-    # get the chapter counts from the app_config YAML
-    num_questions = app_config.get("chapter_question_counts", {}).get(chapter_title, 15)  # fallback to 15
-
-    if not num_questions:
-        raise ValueError(f"Chapter '{chapter_title}' not found in app config.")
-
-    chapter_path = f"data/{chapter_title}.txt"
+    chapter_path = f"{DATA_FOLDER}/{chapter_title}.txt"
     if not os.path.exists(chapter_path):
         raise FileNotFoundError(f"No such chapter text file: {chapter_path}")
 
-    process_chapter_to_sheet(chapter_path, chapter_title, num_questions)
+    # get the chapter counts from the app_config YAML, or size the quiz from the chapter
+    with open(chapter_path, "r", encoding="utf-8") as f:
+        num_questions = get_question_count(chapter_title, f.read())
+
+    if not num_questions:
+        raise ValueError(f"Chapter '{chapter_title}' is disabled in app config.")
+
+    with ledger_context(run_id=new_run_id()):
+        process_chapter_to_sheet(chapter_path, chapter_title, num_questions, manifest=load_manifest())
 
 # ======== Processing Chapters in Batch ========
-def run_batch_quiz_pipeline():
+def list_chapter_files(data_folder: str = DATA_FOLDER) -> dict:
+    return {
+        filename.replace(".txt", "").replace("data/", "").strip(): os.path.join(data_folder, filename)
+        for filename in sorted(os.listdir(data_folder)) if filename.endswith(".txt")
+    }
+
+def group_short_chapters(chapters: list) -> list:
+    """
+    Groups (title, text, num_questions) of short chapters into packs within the
+    `packing` limits of app_config. Longer chapters, and a short one left on
+    its own, are not packed.
+    """
+    max_chapter_words = PACKING_CONFIG.get("max_chapter_words", 800)
+    max_pack_words = PACKING_CONFIG.get("max_pack_words", 3000)
+    max_chapters = PACKING_CONFIG.get("max_chapters", 4)
+
+    packs, current, words = [], [], 0
+    for chapter in chapters:
+        chapter_words = len(chapter[1].split())
+        if chapter_words > max_chapter_words:
+            continue
+        if current and (words + chapter_words > max_pack_words or len(current) >= max_chapters):
+            packs.append(current)
+            current, words = [], 0
+        current.append(chapter)
+        words += chapter_words
+    packs.append(current)
+    return [pack for pack in packs if len(pack) > 1]
+
+def changed_chapters(chapter_titles: list, chapter_files: dict, quiz_counts: dict,
+                     manifest: ChapterManifest, force: bool = False) -> list:
+    """(title, text, num_questions, checkpoint) of the chapters the batch loop will process."""
+    chapters = []
+    for chapter_title in chapter_titles:
+        filepath = chapter_files.get(chapter_title)
+        if filepath is None:
+            continue
+        with open(filepath, "r", encoding="utf-8") as f:
+            chapter_text = f.read()
+        num_questions = get_question_count(chapter_title, chapter_text, quiz_counts)
+        if not num_questions or (not force and manifest.is_unchanged(chapter_title, chapter_text, num_questions)):
+            continue
+        checkpoint = ChapterCheckpoint(STATE_DIR, chapter_title, manifest.fingerprint(chapter_text, num_questions))
+        chapters.append((chapter_title, chapter_text, num_questions, checkpoint))
+    return chapters
+
+def generate_packed_chapters(chapters: list):
+    """
+    Generates the short ones of `chapters` (from changed_chapters) a few per
+    request and saves each quiz as that chapter's "generated" checkpoint, so
+    the regular batch loop only parses and publishes them. Chapters a pack
+    fails for are generated on their own by the loop.
+    """
+    candidates, checkpoints = [], {}
+    for chapter_title, chapter_text, num_questions, checkpoint in chapters:
+        if checkpoint.load("generated") is None:
+            candidates.append((chapter_title, chapter_text, num_questions))
+            checkpoints[chapter_title] = checkpoint
+
+    structured = use_structured_output()
+    for pack in group_short_chapters(candidates):
+        titles = [chapter_title for chapter_title, _, _ in pack]
+        started = time.monotonic()
+        try:
+            quizzes = run_packed_quizzes({chapter_title: (chapter_text, num_questions)
+                                          for chapter_title, chapter_text, num_questions in pack},
+                                         structured=structured, run_stats=get_run_stats())
+        except Exception as e:
+            print(f"⚠️ Packed generation failed for {', '.join(titles)}: {e}. Generating them one by one.")
+            continue
+        seconds = (time.monotonic() - started) / len(pack)
+
+        for chapter_title in titles:
+            quiz_json = finish_quiz_json(quizzes[chapter_title])
+            if not quiz_json["Questions"]:
+                print(f"⚠️ No questions for {chapter_title} from its pack; it will be generated on its own.")
+                continue
+            with ledger_context(chapter=chapter_title):
+                record_chapter(len(quiz_json["Questions"]), seconds)
+            checkpoints[chapter_title].save("generated", quiz_json)
+            print(f"✅ Quiz Generated (packed): {chapter_title}")
+
+def generate_chapters_ahead(chapters: list, pool: PostProcessPool):
+    """
+    Generates the chapters of `chapters` that have no "generated" checkpoint
+    yet, `workers × chunk_size` at a time, and finalizes each such window in one
+    chunked pass over the post-processing pool, so the workers get full chunks
+    instead of one chapter at a time. A window is finalized while the next
+    one's model calls run (its yields reach the planner one window late).
+    Chapters that fail here are left to the batch loop, which retries them
+    on their own.
+    """
+    todo = [chapter for chapter in chapters if chapter[3].load("generated") is None]
+    window = pool.workers * pool.chunk_size
+    structured = use_structured_output()
+
+    def save(generated, collect):
+        for (chapter_title, checkpoint, seconds), quiz in zip(generated, collect()):
+            quiz_json = finish_quiz_json(quiz)
+            with ledger_context(chapter=chapter_title):
+                record_chapter(len(quiz_json["Questions"]), seconds)
+            checkpoint.save("generated", quiz_json)
+            print(f"✅ Quiz Generated: {chapter_title}")
+        print(f"🧮 Finalized {len(generated)} chapter(s) on {pool.workers} worker(s)")
+
+    finalizing = None
+    for start in range(0, len(todo), window):
+        parts, generated = [], []
+        for chapter_title, chapter_text, num_questions, checkpoint in todo[start:start + window]:
+            started = time.monotonic()
+            try:
+                with ledger_context(chapter=chapter_title):
+                    parts.append(generate_quiz_parts(chapter_text, num_questions, structured, get_run_stats()))
+            except Exception as e:
+                print(f"⚠️ Generating {chapter_title} ahead failed: {e}. It will be retried on its own.")
+                continue
+            generated.append((chapter_title, checkpoint, time.monotonic() - started))
+
+        # The previous window was finalized on the pool while this one's model calls ran
+        if finalizing:
+            save(*finalizing)
+        finalizing = (generated, submit_assembly(parts, get_run_stats())) if generated else None
+    if finalizing:
+        save(*finalizing)
+
+def translate_generated_chapters(chapters: list):
+    """Adds the "translated" stage to generated chapters ahead of the batch loop; failures are retried there."""
+    if not TRANSLATION_LANGUAGES:
+        return
+    for chapter_title, _, _, checkpoint in chapters:
+        quiz_json = checkpoint.load("generated")
+        if quiz_json is None or checkpoint.load("translated") is not None:
+            continue
+        try:
+            with ledger_context(chapter=chapter_title):
+                checkpoint.save("translated", translate_quiz_json(quiz_json))
+        except Exception as e:
+            print(f"⚠️ Translating {chapter_title} failed: {e}. It will be retried on its own.")
+
+def parse_generated_chapters(chapters: list, pool: PostProcessPool):
+    """
+    Builds the "parsed" checkpoint of every chapter in `chapters` that has a
+    generated (and, with translations configured, translated) quiz but no
+    table yet (generated ahead, packed or resumed) in one chunked pass over
+    the post-processing pool.
+    """
+    todo = []
+    for chapter_title, _, _, checkpoint in chapters:
+        if checkpoint.load("parsed") is None:
+            quiz_json = checkpoint.load(parsing_stage())
+            if quiz_json is not None:
+                todo.append((checkpoint, quiz_json["Questions"]))
+    if not todo:
+        return
+    tables = pool.tables_many([questions for _, questions in todo])
+    for (checkpoint, _), (columns, rows) in zip(todo, tables):
+        checkpoint.save("parsed", {"columns": columns, "rows": rows})
+    print(f"🧮 Parsed {len(todo)} generated chapter(s) on {pool.workers} worker(s)")
+
+def run_batch_quiz_pipeline(force: bool = False, resume: bool = False, pack: bool = False, workers: int = None):
     app_config = load_app_config()
-    data_folder = "data"
+    data_folder = DATA_FOLDER
     quiz_counts = app_config.get("chapter_question_counts", {})
+    manifest = load_manifest(data_folder)
+    skipped = []
+    failed = []
 
-    for filename in os.listdir(data_folder):
-        if filename.endswith(".txt"):
-            filepath = os.path.join(data_folder, filename)
-            chapter_title = filename.replace(".txt", "").replace("data/", "").strip()
-
-            num_questions = quiz_counts.get(chapter_title.lower(), 15)  # default to 15 if not found
-
-            process_chapter_to_sheet(filepath, chapter_title, num_questions)
+    chapter_files = list_chapter_files(data_folder)
+    if resume:
+        run_state = BatchRunState.resume(STATE_DIR, list(chapter_files))
+    else:
+        run_state = BatchRunState.start(STATE_DIR, list(chapter_files))
+
+    chapters = changed_chapters(run_state.pending(), chapter_files, quiz_counts, manifest, force)
+    if force:
+        # Stages whose fingerprint still matches are reused (no tokens spent twice) unless forced
+        for _, _, _, checkpoint in chapters:
+            checkpoint.clear()
+
+    # CPU-bound post-processing goes to worker processes when more than one is
+    # configured; chapters are then generated ahead and finalized/tabulated in chunks.
+    pool = PostProcessPool(workers or POSTPROCESS_CONFIG.get("workers", 1), POSTPROCESS_CONFIG.get("chunk_size", 16))
+    configure_postprocess(pool if pool.workers > 1 else None)
+    try:
+        # Calls and chapters are recorded in the token ledger under this run (kept across --resume)
+        with pool, ledger_context(run_id=run_state.run_id):
+            if pack:
+                generate_packed_chapters(chapters)
+            if pool.workers > 1:
+                generate_chapters_ahead(chapters, pool)
+            if pack or pool.workers > 1:
+                translate_generated_chapters(chapters)
+                parse_generated_chapters(chapters, pool)
+
+            for chapter_title in run_state.pending():
+                filepath = chapter_files.get(chapter_title)
+                if filepath is None:
+                    continue  # chapter file was removed since the interrupted run
+
+                # Skip chapters whose text, count, models and prompt match the last publish
+                with open(filepath, "r", encoding="utf-8") as f:
+                    chapter_text = f.read()
+                num_questions = get_question_count(chapter_title, chapter_text, quiz_counts)
+                if not force and manifest.is_unchanged(chapter_title, chapter_text, num_questions):
+                    skipped.append(chapter_title)
+                    run_state.mark(chapter_title, "done")
+                    continue
+
+                checkpoint = ChapterCheckpoint(STATE_DIR, chapter_title, manifest.fingerprint(chapter_text, num_questions))
+                for attempt in range(1, MAX_ATTEMPTS + 1):
+                    try:
+                        process_chapter_to_sheet(filepath, chapter_title, num_questions, manifest=manifest, checkpoint=checkpoint)
+                        run_state.mark(chapter_title, "done")
+                        break
+                    except Exception as e:
+                        run_state.mark(chapter_title, "failed", error=f"{type(e).__name__}: {e}")
+                        print(f"❌ {chapter_title} failed (attempt {attempt}/{MAX_ATTEMPTS}): {e}")
+                        if attempt < MAX_ATTEMPTS:
+                            time.sleep(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+                else:
+                    failed.append(chapter_title)
+    finally:
+        configure_postprocess(None)
+
+    if skipped:
+        print(f"⏭️ Skipped {len(skipped)} unchanged chapter(s): {', '.join(skipped)}")
+    if failed:
+        print(f"⚠️ {len(failed)} chapter(s) failed: {', '.join(failed)}. Re-run with --resume to continue.")
+    export_question_bank()
+
+# ======== Question Bank Export ========
+def export_question_bank(path: str = QUESTION_BANK_PATH, data_folder: str = DATA_FOLDER):
+    """
+    Writes the current questions of every chapter to a memory-mappable bank
+    (see question_bank.py), from the parsed checkpoints of batch/worker runs.
+    """
+    quiz_counts = app_config.get("chapter_question_counts", {})
+    manifest = load_manifest(data_folder)
+    tables, missing = {}, []
+
+    for chapter_title, filepath in list_chapter_files(data_folder).items():
+        with open(filepath, "r", encoding="utf-8") as f:
+            chapter_text = f.read()
+        num_questions = get_question_count(chapter_title, chapter_text, quiz_counts)
+        checkpoint = ChapterCheckpoint(STATE_DIR, chapter_title, manifest.fingerprint(chapter_text, num_questions))
+        table = checkpoint.load("parsed")
+        if table is None:
+            missing.append(chapter_title)  # not generated with the current text/settings yet
+            continue
+        tables[chapter_title] = pd.DataFrame(table["rows"], columns=table["columns"])
+
+    count = write_question_bank(path, tables)
+    print(f"📦 Question bank: {count} questions from {len(tables)} chapter(s) → {path}")
+    if missing:
+        print(f"⚠️ No current questions for {len(missing)} chapter(s): {', '.join(missing)}")
+
+# ======== Multi-node Work Queue ========
+def open_work_queue(path: str = None) -> WorkQueue:
+    return WorkQueue(
+        path or QUEUE_CONFIG.get("path", os.path.join(DATA_FOLDER, "quizgen_queue.db")),
+        lease_seconds=QUEUE_CONFIG.get("lease_seconds", 300),
+        max_attempts=MAX_ATTEMPTS,
+    )
+
+def enqueue_batch_chapters(queue: WorkQueue, force: bool = False):
+    quiz_counts = load_app_config().get("chapter_question_counts", {})
+    manifest = load_manifest()
+    queued, skipped = [], []
+
+    for chapter_title, filepath in list_chapter_files().items():
+        with open(filepath, "r", encoding="utf-8") as f:
+            chapter_text = f.read()
+        num_questions = get_question_count(chapter_title, chapter_text, quiz_counts)
+        if not force and manifest.is_unchanged(chapter_title, chapter_text, num_questions):
+            skipped.append(chapter_title)
+            continue
+        fingerprint = manifest.fingerprint(chapter_text, num_questions)
+        if queue.enqueue(chapter_title, filepath, num_questions, fingerprint_key(fingerprint), reopen=force):
+            if force:
+                ChapterCheckpoint(STATE_DIR, chapter_title, fingerprint).clear()
+            queued.append(chapter_title)
+
+    print(f"📥 Queued {len(queued)} chapter(s); {len(skipped)} unchanged. Queue: {queue.counts()}")
+
+def _keep_lease_alive(queue: WorkQueue, chapter_title: str, worker_id: str, stop: threading.Event):
+    interval = QUEUE_CONFIG.get("heartbeat_seconds", 60)
+    while not stop.wait(interval):
+        if not queue.heartbeat(chapter_title, worker_id):
+            print(f"⚠️ Lost the lease on {chapter_title}; another worker may take it over.")
+            return
+
+def run_worker(queue: WorkQueue, worker_id: str = None):
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    manifest = load_manifest()
+    poll_seconds = QUEUE_CONFIG.get("poll_seconds", 10)
+    run_id = new_run_id()
+    print(f"👷 Worker {worker_id} started on {queue.path}")
+
+    while True:
+        job = queue.claim(worker_id)
+        if job is None:
+            if not queue.has_open_work():
+                break
+            time.sleep(poll_seconds)  # other workers hold the remaining leases
+            continue
+
+        chapter_title = job["chapter_title"]
+        with open(job["chapter_path"], "r", encoding="utf-8") as f:
+            fingerprint = manifest.fingerprint(f.read(), job["num_questions"])
+        checkpoint = ChapterCheckpoint(STATE_DIR, chapter_title, fingerprint)
+
+        def check_lease():
+            if not queue.heartbeat(chapter_title, worker_id):
+                raise LeaseLostError(f"lease on {chapter_title} expired before publishing")
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_keep_lease_alive, args=(queue, chapter_title, worker_id, stop), daemon=True)
+        heartbeat.start()
+        try:
+            # Shared per-minute budgets keep all workers together inside the API quotas
+            if checkpoint.load("generated") is None:
+                queue.acquire("groq", QUEUE_CONFIG.get("groq_chapters_per_minute"))
+            queue.acquire("sheets", QUEUE_CONFIG.get("sheets_publishes_per_minute"))
+            with ledger_context(run_id=run_id):
+                spreadsheet_id = process_chapter_to_sheet(
+                    job["chapter_path"], chapter_title, job["num_questions"], manifest=manifest, checkpoint=checkpoint,
+                    before_publish=check_lease
+                )
+        except LeaseLostError as e:
+            # The new lease holder publishes; this worker's generated stages stay in its checkpoint
+            print(f"⚠️ {chapter_title}: {e}; leaving it to the other worker.")
+            continue
+        except Exception as e:
+            print(f"❌ {chapter_title} failed on {worker_id}: {e}")
+            queue.fail(chapter_title, worker_id, f"{type(e).__name__}: {e}")
+            continue
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        if not queue.complete(chapter_title, job["fingerprint"], worker_id, {"spreadsheet_id": spreadsheet_id}):
+            print(f"ℹ️ {chapter_title} was already committed by another worker.")
+
+    print(f"🏁 Worker {worker_id} found no more work. Queue: {queue.counts()}")
+    export_question_bank()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run quiz pipeline for Gurukula content.")
     parser.add_argument("--chapter", type=str, help="Run quiz generation for a specific chapter (e.g. 'chapter16')")
+    parser.add_argument("--force", action="store_true", help="Regenerate every chapter, even if unchanged since the last publish")
+    parser.add_argument("--resume", action="store_true", help="Continue the last batch run with the chapters it did not finish")
+    parser.add_argument("--enqueue", action="store_true", help="Add new/changed chapters to the shared work queue and exit")
+    parser.add_argument("--worker", action="store_true", help="Claim and process chapters from the shared work queue")
+    parser.add_argument("--queue", type=str, help="Path to the shared work-queue database (default from app_config)")
+    parser.add_argument("--pack", action="store_true", help="Generate short chapters several to a request (batch runs only)")
+    parser.add_argument("--workers", type=int, help="Processes for parsing/dedup/DataFrame post-processing (default from app_config)")
+    parser.add_argument("--export-bank", action="store_true", help="Only write the memory-mapped question bank from finished chapters")
 
     args = parser.parse_args()
 
-    if args.chapter:
+    if args.export_bank:
+        export_question_bank()
+    elif args.chapter:
         run_single_quiz_pipeline(args.chapter)
+    elif args.enqueue or args.worker:
+        queue = open_work_queue(args.queue)
+        if args.enqueue:
+            enqueue_batch_chapters(queue, force=args.force)
+        if args.worker:
+            run_worker(queue)
     else:
-        run_batch_quiz_pipeline()
+        run_batch_quiz_pipeline(force=args.force, resume=args.resume, pack=args.pack, workers=args.workers)
@@ -2,12 +2,22 @@
 
 import difflib
 import re
+import contextvars
 from concurrent.futures import ThreadPoolExecutor
 import json
 import json_repair
 from agno.agent import Agent
 from agno.models.groq import Groq
 
+from model_router import ModelRouter
+from grounding import get_grounding_index
+from planner import RunStats, plan_requests, split_targets
+from ledger import ledger_context, record_call
+
+# Placeholder QuizParser uses to pad replies with fewer than four options
+MISSING_OPTION = "(missing option)"
+
+
 class QuizParser:
     """Parses the quiz JSON out of the LLM's response."""
 
@@ -73,7 +83,7 @@ class QuizParser:
                     normalized.append(text)
 
             while len(normalized) < 4:
-                normalized.append("(missing option)")
+                normalized.append(MISSING_OPTION)
 
             normalized = normalized[:4]
             labeled = [f"{label}. {text}" for label, text in zip("abcd", normalized)]
@@ -84,14 +94,240 @@ class QuizParser:
         return quiz
 
 
-def build_english_quiz_agent(model_id: str) -> Agent:
+# ======== Structured output ========
+# Groq's JSON mode only guarantees a syntactically valid object, so replies are
+# still checked with the compiled validator below before they skip QuizParser.
+OPTION_LABEL_PATTERN = re.compile(r"^([a-d])\.\s+\S")
+RIGHT_OPTION_PATTERNS = {
+    "SCQ": re.compile(r"[a-d]"),
+    "MCQ": re.compile(r"[a-d]{2,4}"),
+}
+TIMER_RANGE = (10, 30)
+
+
+def quiz_json_schema(question_type: str) -> dict:
+    """JSON schema for one quiz reply, embedded in the prompt in JSON mode."""
+    question_type = question_type.upper()
+    return {
+        "type": "object",
+        "required": ["Quiz"],
+        "properties": {
+            "Quiz": {
+                "type": "object",
+                "required": ["Topic", "Questions"],
+                "properties": {
+                    "Topic": {"type": "string"},
+                    "Questions": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "required": ["Question", "Question_type", "Options", "Right_Option",
+                                         "Number_Of_Points_Earned", "Chapter", "Timer"],
+                            "properties": {
+                                "Question": {"type": "string", "minLength": 1},
+                                "Question_type": {"const": question_type},
+                                "Options": {
+                                    "type": "array", "minItems": 4, "maxItems": 4,
+                                    "items": {"type": "string", "pattern": OPTION_LABEL_PATTERN.pattern}
+                                },
+                                "Right_Option": {"type": "string", "pattern": f"^{RIGHT_OPTION_PATTERNS[question_type].pattern}$"},
+                                "Number_Of_Points_Earned": {"type": "integer"},
+                                "Chapter": {"type": "string"},
+                                "Timer": {"type": "integer", "minimum": TIMER_RANGE[0], "maximum": TIMER_RANGE[1]}
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+
+# Fields whose errors QuizParser can repair (reply shape and option lists).
+# Other errors are content problems that QuizParser would pass through anyway.
+PARSER_FIXABLE_FIELDS = {"Quiz", "Options"}
+# Integer fields a model sometimes quotes; coerce_numeric_fields() fixes them locally
+NUMERIC_FIELDS = ("Timer", "Number_Of_Points_Earned")
+
+_validators = {}
+
+
+def compile_quiz_validator(question_type: str):
+    """
+    Builds (once per question type) a validator for already-decoded quiz JSON.
+    The validator returns a list of (question_index, field, message) tuples; an
+    empty list means the reply matches quiz_json_schema(). Whole-reply errors
+    use question_index None and field "Quiz".
+    """
+    question_type = question_type.upper()
+    if question_type in _validators:
+        return _validators[question_type]
+
+    right_option_match = RIGHT_OPTION_PATTERNS[question_type].fullmatch
+    label_match = OPTION_LABEL_PATTERN.match
+    timer_min, timer_max = TIMER_RANGE
+
+    def validate(quiz) -> list:
+        if not isinstance(quiz, dict):
+            return [(None, "Quiz", "reply is not a JSON object")]
+        quiz = quiz.get("Quiz", quiz)
+        questions = quiz.get("Questions") if isinstance(quiz, dict) else None
+        if not isinstance(questions, list) or not questions:
+            return [(None, "Quiz", "missing Questions list")]
+
+        errors = []
+        for i, q in enumerate(questions):
+            if not isinstance(q, dict):
+                errors.append((i, "Quiz", "question is not an object"))
+                continue
+            text = q.get("Question")
+            if not isinstance(text, str) or not text.strip():
+                errors.append((i, "Question", "missing question text"))
+            if q.get("Question_type") != question_type:
+                errors.append((i, "Question_type", f"expected {question_type}, got {q.get('Question_type')!r}"))
+            options = q.get("Options")
+            if not isinstance(options, list) or len(options) != 4:
+                errors.append((i, "Options", "expected a list of 4 options"))
+            else:
+                for label, opt in zip("abcd", options):
+                    m = label_match(opt) if isinstance(opt, str) else None
+                    if m is None or m.group(1) != label:
+                        errors.append((i, "Options", f"option {label} is not labeled '{label}. ...'"))
+                        break
+            right = q.get("Right_Option")
+            if not isinstance(right, str) or not right_option_match(right):
+                errors.append((i, "Right_Option", f"{right!r} does not match the {question_type} pattern"))
+            timer = q.get("Timer")
+            if not isinstance(timer, int) or isinstance(timer, bool) or not timer_min <= timer <= timer_max:
+                errors.append((i, "Timer", f"{timer!r} is not between {timer_min} and {timer_max}"))
+            points = q.get("Number_Of_Points_Earned")
+            if not isinstance(points, int) or isinstance(points, bool):
+                errors.append((i, "Number_Of_Points_Earned", f"{points!r} is not an integer"))
+            if "Chapter" not in q:
+                errors.append((i, "Chapter", "missing"))
+        return errors
+
+    _validators[question_type] = validate
+    return validate
+
+
+def parse_quiz_reply(reply_text: str, question_type: str):
+    """
+    Fast path for replies produced in JSON mode: json.loads plus the compiled
+    validator. Replies with errors QuizParser can repair fall back to it.
+    """
+    try:
+        quiz = json.loads(reply_text)
+        # String-wrapped JSON (the whole quiz encoded as a JSON string)
+        if isinstance(quiz, str):
+            quiz = json.loads(quiz)
+    except (json.JSONDecodeError, TypeError):
+        quiz = None
+
+    if quiz is not None:
+        errors = compile_quiz_validator(question_type)(quiz)
+        if not any(field in PARSER_FIXABLE_FIELDS for _, field, _ in errors):
+            return quiz.get("Quiz", quiz)
+
+    return QuizParser().run(reply_text)
+
+
+# Optional process pool for finalizing many chapters at once (MCQ filtering
+# and dedup, answer balancing); see postprocess.py. Single replies are always
+# parsed in the calling thread: one item per process round trip costs more
+# than it saves. None runs everything in the calling thread.
+_postprocess_pool = None
+
+
+def configure_postprocess(pool=None):
+    global _postprocess_pool
+    _postprocess_pool = pool
+
+
+def build_english_quiz_agent(model_id: str, structured: bool = False, timeout: float = None) -> Agent:
+    if structured:
+        # Provider-side JSON mode: the reply is always a single JSON object.
+        agent = Agent(
+            model=Groq(id=model_id, timeout=timeout, request_params={"response_format": {"type": "json_object"}}),
+            markdown=False
+        )
+        return agent
+
     agent = Agent(
-        model=Groq(id=model_id),
+        model=Groq(id=model_id, timeout=timeout),
         markdown=True
     )
     return agent
 
 
+# ======== Model routing ========
+# First model is the primary; the rest are used for hedged requests and fallback.
+MODEL_ROUTES = {
+    "SCQ": ["llama3-70b-8192", "llama-3.3-70b-versatile"],
+    "MCQ": ["llama-3.3-70b-versatile", "llama3-70b-8192"],
+}
+
+ROUTING_SETTINGS = {
+    "deadline": 90.0,          # seconds per agent.run, including hedges and fallbacks
+    "hedge_percentile": 0.95,  # hedge once the primary is slower than this latency percentile
+    "min_samples": 5,          # calls observed before hedging kicks in
+    "failure_threshold": 3,    # consecutive errors that open a model's circuit breaker
+    "reset_after": 60.0,       # seconds before an open breaker lets a probe call through
+}
+
+_routers = {}
+
+
+def configure_routing(settings: dict = None, routes: dict = None):
+    """Overrides ROUTING_SETTINGS / MODEL_ROUTES (e.g. from app_config) and drops cached routers."""
+    ROUTING_SETTINGS.update(settings or {})
+    MODEL_ROUTES.update(routes or {})
+    _routers.clear()
+
+
+def is_quiz_reply(response) -> bool:
+    """
+    Check used to pick the winning reply: the content must parse to a quiz with
+    a Questions list (or, for packed replies, chapters holding one). Per-question
+    validation happens after parsing.
+    """
+    content = getattr(response, "content", None)
+    if not isinstance(content, str):
+        return False
+    try:
+        data = json.loads(content)
+        if isinstance(data, str):
+            data = json.loads(data)
+    except (json.JSONDecodeError, TypeError):
+        data = json_repair.loads(content)  # markdown replies: JSON inside prose or a code fence
+
+    def has_questions(quiz) -> bool:
+        quiz = quiz.get("Quiz", quiz) if isinstance(quiz, dict) else None
+        return isinstance(quiz, dict) and isinstance(quiz.get("Questions"), list)
+
+    if not isinstance(data, dict):
+        return False
+    chapters = data.get("Chapters")
+    if isinstance(chapters, dict):
+        return any(has_questions(quiz) for quiz in chapters.values())
+    return has_questions(data)
+
+
+def get_quiz_router(question_type: str, structured: bool = True) -> ModelRouter:
+    """Shared router per question type, so latency stats and breakers persist across chapters."""
+    key = (question_type.upper(), structured)
+    if key not in _routers:
+        timeout = ROUTING_SETTINGS["deadline"]
+        _routers[key] = ModelRouter(
+            MODEL_ROUTES[key[0]],
+            lambda model_id: build_english_quiz_agent(model_id, structured, timeout),
+            is_valid=is_quiz_reply,
+            on_call=record_call,
+            **ROUTING_SETTINGS
+        )
+    return _routers[key]
+
+
 def get_example_block(question_type: str) -> str:
     if question_type.upper() == "SCQ":
         return '''\
@@ -149,10 +385,40 @@ def get_example_block(question_type: str) -> str:
         raise ValueError(f"Unsupported question_type: {question_type}")
 
 
-def build_prompt(chapter_text: str, count: int, question_type: str) -> str:
-    type_label = "Single Choice Questions (SCQ)" if question_type == "SCQ" else "Multiple Choice Questions (MCQ)"
-    variation_clause = """Vary correct option combinations. Use examples like "bc", "cd", "bd", "ac". Do not always include "a".""" \
-        if question_type == "MCQ" else """Avoid repeating the same option (like "a") in all correct answers — aim for balanced and varied use of "a", "b", "c", and "d" throughout."""
+# Bump whenever build_prompt/get_example_block change what the model is asked for;
+# batch runs regenerate chapters that were published with an older version.
+PROMPT_VERSION = "2"
+
+
+def question_type_label(question_type: str) -> str:
+    return "Single Choice Questions (SCQ)" if question_type == "SCQ" else "Multiple Choice Questions (MCQ)"
+
+
+def build_prompt(chapter_text: str, count: int, question_type: str, structured: bool = False,
+                 avoid_questions: list = None) -> str:
+    return compose_prompt(
+        question_type, structured, avoid_questions,
+        intro="Based on the following passage, generate a quiz in valid JSON format.",
+        count_clause=f"- The quiz must contain exactly {count} {question_type_label(question_type)}.",
+        shape_clause="""- Output must be a valid JSON **dictionary** with the following structure:
+            {
+                "Quiz": {
+                    "Topic": "...",
+                    "Questions": [ ... ]
+                }
+            }
+            Do not output a plain array. It must be wrapped inside the dictionary above.""",
+        schema=quiz_json_schema(question_type),
+        story_block=f"""Here is the story:
+        \"\"\"
+        {chapter_text}
+        \"\"\"""",
+    )
+
+
+def compose_prompt(question_type: str, structured: bool, avoid_questions: list, intro: str, count_clause: str,
+                   shape_clause: str, schema: dict, story_block: str) -> str:
+    """Shared instructions of single-chapter and packed prompts; the arguments are the parts that differ."""
     points_clause = "15" if question_type == "MCQ" else "10"
     right_option_clause = """
         - Must contain **two or more** correct answers (e.g., "ac", "bcd", "cd")
@@ -174,12 +440,21 @@ def build_prompt(chapter_text: str, count: int, question_type: str) -> str:
         "Right_Option": "bc"  ← ✅ Two correct answers.
         """ \
         if question_type == "MCQ" else ""
+    schema_clause = f"""
+        == JSON SCHEMA ==
+        Reply with a single JSON object that validates against this schema:
+        {json.dumps(schema, ensure_ascii=False)}
+        """ \
+        if structured else ""
+    avoid_clause = "- Do not repeat or paraphrase these questions, which are already in the quiz:\n" + \
+        "\n".join(f"            * {q}" for q in avoid_questions) \
+        if avoid_questions else ""
 
     return f"""
-        You are an expert quiz generator. Based on the following passage, generate a quiz in valid JSON format.
+        You are an expert quiz generator. {intro}
 
         == QUIZ STRUCTURE ==
-        - The quiz must contain exactly {count} {type_label}.
+        {count_clause}
         - Every question must test a unique concept and be based solely on the passage.
         
         == QUESTION FORMAT ==
@@ -193,52 +468,40 @@ def build_prompt(chapter_text: str, count: int, question_type: str) -> str:
         - d. ...
         - "Right_Option":   
             - {right_option_clause}
-        - "Number_Of_Points_Earned": "{points_clause}"
+        - "Number_Of_Points_Earned": {points_clause} (an integer, not a string)
         - "Chapter": e.g. "Chapter 1"
         - "Timer": an integer from 10 to 30, depending on difficulty
 
         == RULES ==
-        - Output must be a valid JSON **dictionary** with the following structure:
-            {{
-                "Quiz": {{
-                    "Topic": "...",
-                    "Questions": [ ... ]
-                }}
-            }}
-            Do not output a plain array. It must be wrapped inside the dictionary above.
+        {shape_clause}
         - No "all of the above" or similar options.
         - Do not include explanations, markdown, or formatting.
         - Don't default Timer for 15 or 20, all the time. Introduce some variety.        
         - Every question must be logically answerable using the passage.
-        - {variation_clause}
+        {avoid_clause}
         {mcq_option_clause}
-
+        {schema_clause}
         {get_example_block(question_type)}
         
-        Here is the story:
-        \"\"\"
-        {chapter_text}
-        \"\"\"
+        {story_block}
     """
 
 
-def run_parallel_quiz(chapter_text: str, num_scq: int, num_mcq: int):
-    scq_agent = build_english_quiz_agent("llama3-70b-8192")
-    mcq_agent = build_english_quiz_agent("llama-3.3-70b-versatile")
-
-    parser = QuizParser()
+def run_parallel_quiz(chapter_text: str, num_scq: int, num_mcq: int, structured: bool = True):
+    scq_agent = get_quiz_router("SCQ", structured)
+    mcq_agent = get_quiz_router("MCQ", structured)
 
     with ThreadPoolExecutor() as executor:
-        f_scq = executor.submit(scq_agent.run, build_prompt(chapter_text, num_scq, "SCQ"))
+        f_scq = executor.submit(scq_agent.run, build_prompt(chapter_text, num_scq, "SCQ", structured))
         r_scq = f_scq.result()
 
-        f_mcq = executor.submit(mcq_agent.run, build_prompt(chapter_text, num_mcq, "MCQ"))
+        f_mcq = executor.submit(mcq_agent.run, build_prompt(chapter_text, num_mcq, "MCQ", structured))
         r_mcq = f_mcq.result()
 
-    scq_data = parser.run(r_scq.content)
-    mcq_data = parser.run(r_mcq.content)
+    scq_data = parse_quiz_reply(r_scq.content, "SCQ")
+    mcq_data = parse_quiz_reply(r_mcq.content, "MCQ")
 
-    all_questions = scq_data.get("Questions", []) + mcq_data.get("Questions", [])
+    all_questions = balance_answer_keys(scq_data.get("Questions", []) + mcq_data.get("Questions", []))
 
     return {
         "Quiz": {
@@ -248,44 +511,206 @@ def run_parallel_quiz(chapter_text: str, num_scq: int, num_mcq: int):
     }
 
 
-def is_valid_mcq_option(opt: str) -> bool:
-    return bool(re.fullmatch(r"[a-d]{2,4}", opt))
-
-
-def validate_mcqs(mcq_questions: list, min_valid: int) -> bool:
-    valid_count = sum(1 for q in mcq_questions if len(q["Right_Option"].replace(" ", "")) > 1)
-    print(f"✅ Valid MCQs: {valid_count}/{len(mcq_questions)}")
-    return valid_count >= min_valid
-
-
-def run_scq_only(chapter_text: str, num_scq: int):
-    scq_agent = build_english_quiz_agent("llama3-70b-8192")
-    parser = QuizParser()
-    scq_prompt = build_prompt(chapter_text, num_scq, "SCQ")
-    r_scq = scq_agent.run(scq_prompt)
-    return parser.run(r_scq.content)
-
-
-def run_mcq_with_retries(chapter_text: str, num_mcq: int, max_retries: int = 3):
-    mcq_agent = build_english_quiz_agent("llama-3.3-70b-versatile")
-    mcq_prompt = build_prompt(chapter_text, num_mcq, "MCQ")  # Over-generate
+# ======== Answer key balancing ========
+def balance_answer_keys(questions: list, target: dict = None) -> list:
+    """
+    Reorders each question's options so the correct letters are spread across
+    the quiz according to `target` (relative weights per letter, uniform by
+    default), and rewrites Right_Option to match. SCQs and MCQs are balanced
+    separately. Deterministic: the same questions always get the same layout.
+    Questions whose options/Right_Option cannot be mapped are left untouched.
+    Letters weighted 0 only take a correct answer when a question has more
+    correct options than there are weighted letters.
+    """
+    target = target or {label: 1.0 for label in "abcd"}
+    weights = {label: target.get(label, 1.0) for label in "abcd"}
+    if any(weight < 0 for weight in weights.values()) or not any(weights.values()):
+        raise ValueError(f"Answer key target needs non-negative weights and at least one above 0: {target}")
+    counts = {qtype: {label: 0 for label in "abcd"} for qtype in ("SCQ", "MCQ")}
+
+    for i, q in enumerate(questions):
+        options = q.get("Options")
+        right = q.get("Right_Option")
+        qtype = str(q.get("Question_type", "")).upper()
+        if qtype not in counts or not isinstance(options, list) or len(options) != 4 or not isinstance(right, str):
+            continue
+        right_letters = sorted(set(right.replace(" ", "").lower()))
+        if not right_letters or any(letter not in "abcd" for letter in right_letters):
+            continue
+
+        texts = [re.sub(r"^[a-dA-D]\.\s*", "", opt.strip()) for opt in options]
+        correct = [texts["abcd".index(letter)] for letter in right_letters]
+        incorrect = [text for label, text in zip("abcd", texts) if label not in right_letters]
+
+        # Least-used letters (relative to target) take the correct answers;
+        # rotating the tie-break by position avoids always favouring "a".
+        letter_counts = counts[qtype]
+        ranked = sorted("abcd", key=lambda l: (weights[l] == 0, letter_counts[l] / (weights[l] or 1.0),
+                                               ("abcd".index(l) - i) % 4))
+        new_letters = sorted(ranked[:len(correct)])
+
+        correct_iter, incorrect_iter = iter(correct), iter(incorrect)
+        new_texts = [next(correct_iter) if label in new_letters else next(incorrect_iter) for label in "abcd"]
+        q["Options"] = [f"{label}. {text}" for label, text in zip("abcd", new_texts)]
+        q["Right_Option"] = "".join(new_letters)
+        for letter in new_letters:
+            letter_counts[letter] += 1
+
+    return questions
+
+
+# ======== Per-question validation ========
+# Questions whose words (and the correct option's) are barely found in the
+# passage are treated as ungrounded and regenerated; 0 disables the check.
+GROUNDING_SETTINGS = {
+    "min_support": 0.15,
+}
+
+
+def configure_grounding(settings: dict = None):
+    GROUNDING_SETTINGS.update(settings or {})
+
+
+def coerce_numeric_fields(questions: list) -> list:
+    """
+    Turns numeric strings in the integer fields ("Timer": "20") into ints in
+    place, so a quoted number is not flagged and regenerated.
+    """
+    for q in questions:
+        if not isinstance(q, dict):
+            continue
+        for field in NUMERIC_FIELDS:
+            value = q.get(field)
+            if isinstance(value, str) and value.strip().isdigit():
+                q[field] = int(value)
+    return questions
 
-    min_valid = max(1, num_mcq // 2)  # At least half (rounded down), but at least 1
 
-    for attempt in range(max_retries):
-        print(f"Running MCQ generation (Attempt {attempt + 1}/{max_retries})...")
+def validate_questions(questions: list, question_type: str, chapter_text: str = None) -> dict:
+    """
+    Flags individual bad questions instead of judging the whole set.
+    Returns {index: [issue, ...]}; questions not in the dict are usable as is.
+    With `chapter_text`, well-formed questions are also checked for lexical
+    support in the passage.
+    """
+    flagged = {}
+    for i, field, message in compile_quiz_validator(question_type)({"Questions": questions}):
+        if i is not None:
+            flagged.setdefault(i, []).append(f"{field}: {message}")
+
+    for i, q in enumerate(questions):
+        if not isinstance(q, dict) or not isinstance(q.get("Options"), list):
+            continue
+        texts = [re.sub(r"^[a-dA-D]\.\s*", "", opt).strip() if isinstance(opt, str) else "" for opt in q["Options"]]
+        padded = {label for label, text in zip("abcd", texts) if not text or text == MISSING_OPTION}
+        if padded:
+            flagged.setdefault(i, []).append(f"Options: missing option(s) {''.join(sorted(padded))}")
+        normalized = [text.lower() for text in texts if text and text != MISSING_OPTION]
+        if len(set(normalized)) < len(normalized):
+            flagged.setdefault(i, []).append("Options: duplicate options")
+
+        right = q.get("Right_Option")
+        if isinstance(right, str):
+            if padded & set(right):
+                flagged.setdefault(i, []).append("Right_Option: points at a padded option")
+            if len(set(right)) < len(right):
+                flagged.setdefault(i, []).append("Right_Option: repeats a letter")
+
+    min_support = GROUNDING_SETTINGS["min_support"]
+    if chapter_text and min_support:
+        index = get_grounding_index(chapter_text)
+        for i, q in enumerate(questions):
+            if i in flagged:
+                continue
+            score = index.score(q)
+            if score["support"] < min_support:
+                flagged[i] = [f"Grounding: low support in passage ({score['support']:.2f}, "
+                              f"answer {score['answer']:.2f}, locality {score['locality']:.2f})"]
+
+    return flagged
+
+
+def repair_questions(agent, chapter_text: str, questions: list, question_type: str, min_valid: int,
+                     max_rounds: int = 2, structured: bool = True, tally: dict = None,
+                     avoid_questions: list = None) -> list:
+    """
+    Drops flagged questions and, if that leaves fewer than `min_valid`, asks the
+    model for just the shortfall in one batched call per round. Replacements
+    take the flagged slots so the question order stays stable. Extra questions
+    requested are added to `tally["requested"]`.
+    """
+    questions = coerce_numeric_fields(list(questions))
+
+    for round_num in range(max_rounds + 1):
+        flagged = validate_questions(questions, question_type, chapter_text)
+        valid_count = len(questions) - len(flagged)
+        for i, issues in sorted(flagged.items()):
+            print(f"⚠️ {question_type} Q{i + 1} flagged: {'; '.join(issues)}")
+
+        shortfall = max(0, min_valid - valid_count)
+        if not shortfall or round_num == max_rounds:
+            break
+
+        print(f"🔁 Regenerating {shortfall} {question_type} question(s) (round {round_num + 1}/{max_rounds})...")
+        keep = [q for i, q in enumerate(questions) if i not in flagged]
+        prompt = build_prompt(chapter_text, shortfall, question_type, structured,
+                              avoid_questions=(avoid_questions or []) + [q["Question"] for q in keep])
+        with ledger_context(attempt=round_num + 1):
+            reply = agent.run(prompt)
+        if tally is not None:
+            tally["requested"] += shortfall
+        replacements = coerce_numeric_fields(parse_quiz_reply(reply.content, question_type).get("Questions", []))
+        bad = validate_questions(replacements, question_type, chapter_text)
+        replacements = [q for i, q in enumerate(replacements) if i not in bad][:shortfall]
+
+        slots = sorted(flagged)
+        for i, replacement in zip(slots, replacements):
+            questions[i] = replacement
+        questions.extend(replacements[len(slots):])
+
+    valid = [q for i, q in enumerate(questions) if i not in flagged]
+    print(f"✅ Valid {question_type}s: {len(valid)}/{len(questions)}")
+    return valid
+
+
+def run_scq_only(chapter_text: str, num_scq: int, structured: bool = True, min_valid: int = None,
+                 avoid_questions: list = None):
+    scq_agent = get_quiz_router("SCQ", structured)
+    scq_prompt = build_prompt(chapter_text, num_scq, "SCQ", structured, avoid_questions=avoid_questions)
+    with ledger_context(question_type="SCQ", attempt=0, prompt_version=PROMPT_VERSION):
+        r_scq = scq_agent.run(scq_prompt)
+        scq_data = parse_quiz_reply(r_scq.content, "SCQ")
+        tally = {"model": scq_agent.last_model(), "requested": num_scq}
+
+        min_valid = num_scq if min_valid is None else min_valid
+        scq_data["Questions"] = repair_questions(
+            scq_agent, chapter_text, scq_data.get("Questions", []), "SCQ", min_valid, structured=structured,
+            tally=tally, avoid_questions=avoid_questions
+        )
+    scq_data["Stats"] = tally
+    return scq_data
+
+
+def run_mcq_with_retries(chapter_text: str, num_mcq: int, max_retries: int = 3, structured: bool = True,
+                         min_valid: int = None, avoid_questions: list = None):
+    mcq_agent = get_quiz_router("MCQ", structured)
+    mcq_prompt = build_prompt(chapter_text, num_mcq, "MCQ", structured, avoid_questions=avoid_questions)  # Over-generate
+
+    if min_valid is None:
+        min_valid = max(1, num_mcq // 2)  # At least half (rounded down), but at least 1
+
+    print("Running MCQ generation...")
+    with ledger_context(question_type="MCQ", attempt=0, prompt_version=PROMPT_VERSION):
         r_mcq = mcq_agent.run(mcq_prompt)
-        parser = QuizParser()
-        mcq_data = parser.run(r_mcq.content)
-        mcq_questions = mcq_data.get("Questions", [])
-
-        if validate_mcqs(mcq_questions, min_valid):
-            print("✅ Enough valid MCQs found.")
-            return mcq_data
-        else:
-            print("❌ Not enough valid MCQs. Retrying...\n")
-
-    print("⚠️ Max retries reached. Returning last MCQ version.")
+        mcq_data = parse_quiz_reply(r_mcq.content, "MCQ")
+        tally = {"model": mcq_agent.last_model(), "requested": num_mcq}
+
+        # Later attempts only regenerate the flagged questions, not the whole set
+        mcq_data["Questions"] = repair_questions(
+            mcq_agent, chapter_text, mcq_data.get("Questions", []), "MCQ", min_valid,
+            max_rounds=max_retries - 1, structured=structured, tally=tally, avoid_questions=avoid_questions
+        )
+    mcq_data["Stats"] = tally
     return mcq_data
 
 
@@ -317,31 +742,221 @@ def deduplicate_questions(scq_list, mcq_list, threshold=0.85):
 
 
 # def run_parallel_quiz_with_mcq_retry(chapter_text: str, num_scq: int, num_mcq: int):
-def run_parallel_quiz_with_mcq_retry(chapter_text: str, num_questions: int):
+def run_parallel_quiz_with_mcq_retry(chapter_text: str, num_questions: int, structured: bool = True,
+                                     run_stats: RunStats = None, avoid_questions: list = None):
+    scq_data, mcq_data, targets = generate_quiz_parts(chapter_text, num_questions, structured, run_stats,
+                                                      avoid_questions)
+    return assemble_quiz(scq_data, mcq_data, targets, run_stats)
+
+
+def generate_quiz_parts(chapter_text: str, num_questions: int, structured: bool = True,
+                        run_stats: RunStats = None, avoid_questions: list = None) -> tuple:
+    """
+    The model calls of run_parallel_quiz_with_mcq_retry without the final
+    selection: returns (scq_data, mcq_data, targets) for assemble_quiz(zes), so
+    batch runs can finalize many chapters in one pass.
+    """
+    # Logic to split SCQ and MCQ into half
+    targets = split_targets(num_questions)
+    num_scq_to_pick = targets["SCQ"]
+    num_mcq_to_pick = targets["MCQ"]
+
+    # Without history, over-generate num_questions of each type; with it, ask
+    # for just enough to meet the targets given each model's past yield.
+    requests = {"SCQ": num_questions, "MCQ": num_questions}
+    if run_stats is not None:
+        plan = plan_requests(num_questions, run_stats, {t: MODEL_ROUTES[t][0] for t in targets})
+        requests = {t: p["request"] for t, p in plan.items()}
+        print(f"📐 Planned requests: {requests['SCQ']} SCQ / {requests['MCQ']} MCQ for {num_questions} questions")
+
+    # copy_context() carries the caller's ledger fields (run, chapter) into the workers
     with ThreadPoolExecutor() as executor:
-        f_scq = executor.submit(run_scq_only, chapter_text, num_questions)
-        f_mcq = executor.submit(run_mcq_with_retries, chapter_text, num_questions)
+        f_scq = executor.submit(contextvars.copy_context().run, run_scq_only,
+                                chapter_text, requests["SCQ"], structured, num_scq_to_pick, avoid_questions)
+        f_mcq = executor.submit(contextvars.copy_context().run, run_mcq_with_retries,
+                                chapter_text, requests["MCQ"], structured=structured, min_valid=num_mcq_to_pick,
+                                avoid_questions=avoid_questions)
 
         scq_data = f_scq.result()
         mcq_data = f_mcq.result()
 
-    # Logic to split SCQ and MCQ into half
-    half = num_questions // 2
-    num_scq_to_pick = half + (num_questions % 2)  # SCQ gets the extra if odd
-    num_mcq_to_pick = half
+    return scq_data, mcq_data, targets
 
-    scq_questions = scq_data.get("Questions", [])[:num_scq_to_pick]
 
-    valid_mcq_questions = get_valid_mcqs(mcq_data.get("Questions", []), num_mcq_to_pick*2)  # get more MCQs first to allow filtering
+def finalize_questions(scq_questions: list, mcq_questions: list, targets: dict):
+    """
+    Picks the final SCQs and MCQs (valid, not duplicating an SCQ) and balances
+    the answer keys. Returns (questions, {question_type: number usable}); the
+    usable counts are taken before trimming to the targets, so the planner sees
+    how much a model over-produced, not just whether it met the target.
+    """
+    num_scq_to_pick = targets["SCQ"]
+    num_mcq_to_pick = targets["MCQ"]
+    usable_scqs = len(scq_questions)
+    scq_questions = scq_questions[:num_scq_to_pick]
+
+    valid_mcq_questions = get_valid_mcqs(mcq_questions, len(mcq_questions))
     valid_mcq_questions = deduplicate_questions(scq_questions, valid_mcq_questions)
     # Then slice to desired number
     mcq_questions = valid_mcq_questions[:num_mcq_to_pick]
 
-    all_questions = scq_questions + mcq_questions
+    all_questions = balance_answer_keys(scq_questions + mcq_questions)
+    return all_questions, {"SCQ": usable_scqs, "MCQ": len(valid_mcq_questions)}
 
+
+def assemble_quiz(scq_data: dict, mcq_data: dict, targets: dict, run_stats: RunStats = None) -> dict:
+    return assemble_quizzes([(scq_data, mcq_data, targets)], run_stats)[0]
+
+
+def assemble_quizzes(items: list, run_stats: RunStats = None) -> list:
+    """
+    Final quizzes for [(scq_data, mcq_data, targets), ...], one per chapter;
+    several chapters are finalized as one chunked job when a pool is configured.
+    """
+    return submit_assembly(items, run_stats)()
+
+
+def submit_assembly(items: list, run_stats: RunStats = None):
+    """
+    assemble_quizzes in two steps: the finalize pass starts on the pool now, and
+    the returned function waits for it, records the yields in `run_stats` and
+    returns the quizzes. Without a pool it all happens before returning.
+    """
+    selections = [(scq_data.get("Questions", []), mcq_data.get("Questions", []), targets)
+                  for scq_data, mcq_data, targets in items]
+    if _postprocess_pool is not None:
+        collect = _postprocess_pool.submit_finalize(selections)
+    else:
+        finalized = [finalize_questions(*selection) for selection in selections]
+        collect = lambda: finalized
+
+    def build() -> list:
+        quizzes = []
+        for (scq_data, mcq_data, _), (all_questions, usable) in zip(items, collect()):
+            if run_stats is not None:
+                for question_type, data in (("SCQ", scq_data), ("MCQ", mcq_data)):
+                    run_stats.record(data["Stats"]["model"], question_type, data["Stats"]["requested"],
+                                     usable[question_type])
+            quizzes.append({
+                "Quiz": {
+                    "Topic": scq_data.get("Topic") or mcq_data.get("Topic", "Unknown Topic"),
+                    "Questions": all_questions
+                }
+            })
+        return quizzes
+    return build
+
+
+# ======== Packed generation ========
+# Several short chapters share one request per question type, so the fixed
+# instructions and examples are paid for once per pack instead of per chapter.
+def packed_json_schema(question_type: str) -> dict:
     return {
-        "Quiz": {
-            "Topic": scq_data.get("Topic") or mcq_data.get("Topic", "Unknown Topic"),
-            "Questions": all_questions
+        "type": "object",
+        "required": ["Chapters"],
+        "properties": {
+            "Chapters": {"type": "object", "additionalProperties": quiz_json_schema(question_type)}
         }
     }
+
+
+def build_packed_prompt(chapters: list, question_type: str, structured: bool = False) -> str:
+    """`chapters` is [(chapter_id, chapter_text, count), ...]."""
+    label = question_type_label(question_type)
+    counts = "\n".join(f'        - Chapter "{cid}": exactly {count} {label}.' for cid, _, count in chapters)
+    stories = "\n\n".join(f'        === CHAPTER {cid} ===\n        \"\"\"\n        {text}\n        \"\"\"'
+                          for cid, text, _ in chapters)
+    return compose_prompt(
+        question_type, structured, None,
+        intro="Generate a separate quiz for each of the chapters below, all in one valid JSON reply.",
+        count_clause=f"""- Quizzes to generate, by chapter id:
+{counts}
+        - Each quiz must only use the passage of its own chapter.""",
+        shape_clause="""- Output must be a valid JSON **dictionary** with one quiz per chapter id:
+            {
+                "Chapters": {
+                    "<chapter id>": { "Quiz": { "Topic": "...", "Questions": [ ... ] } },
+                    ...
+                }
+            }
+            Include every chapter id listed above.""",
+        schema=packed_json_schema(question_type),
+        story_block=f"Here are the chapters:\n\n{stories}",
+    )
+
+
+def parse_packed_reply(reply_text: str, question_type: str, chapter_ids: list) -> dict:
+    """Splits a packed reply into {chapter_id: quiz}; chapters missing from the reply get no questions."""
+    try:
+        data = json.loads(reply_text)
+        if isinstance(data, str):
+            data = json.loads(data)
+    except (json.JSONDecodeError, TypeError):
+        data = json_repair.loads(reply_text or "")
+
+    chapters = data.get("Chapters") if isinstance(data, dict) else None
+    if not isinstance(chapters, dict):
+        chapters = {}
+    present = [cid for cid in chapter_ids if isinstance(chapters.get(cid), dict)]
+    parsed = {cid: parse_quiz_reply(json.dumps(chapters[cid], ensure_ascii=False), question_type) for cid in present}
+    return {cid: parsed.get(cid, {"Questions": []}) for cid in chapter_ids}
+
+
+def run_packed_type(chapters: dict, requests: dict, question_type: str, structured: bool = True) -> dict:
+    """
+    One packed call for `question_type`, then a per-chapter repair of flagged or
+    missing questions. `chapters` maps chapter ids to (title, text, targets).
+    """
+    agent = get_quiz_router(question_type, structured)
+    prompt = build_packed_prompt([(cid, text, requests[cid]) for cid, (_, text, _) in chapters.items()],
+                                 question_type, structured)
+    titles = ", ".join(title for title, _, _ in chapters.values())
+    with ledger_context(chapter=titles, question_type=question_type, attempt=0, prompt_version=PROMPT_VERSION):
+        reply = agent.run(prompt)
+    model = agent.last_model()
+    parsed = parse_packed_reply(reply.content, question_type, list(chapters))
+
+    results = {}
+    for cid, (title, text, targets) in chapters.items():
+        data = parsed[cid]
+        tally = {"model": model, "requested": requests[cid]}
+        with ledger_context(chapter=title, question_type=question_type, prompt_version=PROMPT_VERSION):
+            data["Questions"] = repair_questions(
+                agent, text, data.get("Questions", []), question_type, targets[question_type],
+                structured=structured, tally=tally
+            )
+        data["Stats"] = tally
+        results[cid] = data
+    return results
+
+
+def run_packed_quizzes(chapters: dict, structured: bool = True, run_stats: RunStats = None) -> dict:
+    """
+    Packed counterpart of run_parallel_quiz_with_mcq_retry for several chapters:
+    `chapters` maps titles to (chapter_text, num_questions); returns {title: quiz}.
+    """
+    packed = {}
+    requests = {"SCQ": {}, "MCQ": {}}
+    for i, (title, (text, num_questions)) in enumerate(chapters.items(), start=1):
+        cid = f"c{i}"
+        targets = split_targets(num_questions)
+        packed[cid] = (title, text, targets)
+        planned = {"SCQ": num_questions, "MCQ": num_questions}
+        if run_stats is not None:
+            plan = plan_requests(num_questions, run_stats, {t: MODEL_ROUTES[t][0] for t in targets})
+            planned = {t: p["request"] for t, p in plan.items()}
+        for question_type in requests:
+            requests[question_type][cid] = planned[question_type]
+
+    print(f"📦 Packed request for {len(chapters)} chapter(s): {', '.join(chapters)}")
+    with ThreadPoolExecutor() as executor:
+        f_scq = executor.submit(contextvars.copy_context().run, run_packed_type,
+                                packed, requests["SCQ"], "SCQ", structured)
+        f_mcq = executor.submit(contextvars.copy_context().run, run_packed_type,
+                                packed, requests["MCQ"], "MCQ", structured)
+        scq_results = f_scq.result()
+        mcq_results = f_mcq.result()
+
+    quizzes = assemble_quizzes([(scq_results[cid], mcq_results[cid], targets)
+                                for cid, (_, _, targets) in packed.items()], run_stats)
+    return {title: quiz for (title, _, _), quiz in zip(packed.values(), quizzes)}
@@ -0,0 +1,208 @@
+# backend/ledger.py
+# -*- coding: utf-8 -*-
+#
+# Token ledger: one JSONL row per model call (and one per generated chapter),
+# keyed by run, chapter, model, question type, attempt and prompt version.
+# Report from the repo root:
+#
+#   python backend/ledger.py                     # latest run
+#   python backend/ledger.py --all --top 20      # every run, 20 slowest chapters
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Fields (run_id, chapter, question_type, attempt, ...) attached to every row
+# written by the current thread; see ledger_context.
+LEDGER_CONTEXT = contextvars.ContextVar("ledger_context", default={})
+
+_ledger = None
+
+
+@contextmanager
+def ledger_context(**fields):
+    token = LEDGER_CONTEXT.set({**LEDGER_CONTEXT.get(), **fields})
+    try:
+        yield
+    finally:
+        LEDGER_CONTEXT.reset(token)
+
+
+def new_run_id() -> str:
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{os.getpid()}"
+
+
+def usage_from_response(response) -> dict:
+    """Token counts from an agno RunOutput (RunMetrics, or the older dict of per-message lists)."""
+    metrics = getattr(response, "metrics", None)
+    usage = {}
+    for name in ("input_tokens", "output_tokens", "total_tokens"):
+        value = metrics.get(name) if isinstance(metrics, dict) else getattr(metrics, name, None)
+        if isinstance(value, list):
+            value = sum(v for v in value if v)
+        usage[name] = int(value or 0)
+    if not usage["total_tokens"]:
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+    return usage
+
+
+class TokenLedger:
+    """Append-only JSONL file; each row is written with a single O_APPEND write."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def append(self, row: dict):
+        line = (json.dumps(row, ensure_ascii=False, sort_keys=True) + "\n").encode("utf-8")
+        with self.lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+    def read(self) -> list:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+def configure_ledger(path: str = None):
+    """Sets the process-wide ledger; None turns recording off."""
+    global _ledger
+    _ledger = TokenLedger(path) if path else None
+
+
+def record_call(model_id: str, response=None, latency: float = None, status: str = "ok", context: dict = None):
+    """One model call. `context` defaults to the caller's ledger_context."""
+    if _ledger is None:
+        return
+    _ledger.append({
+        "kind": "call",
+        "at": time.time(),
+        **(LEDGER_CONTEXT.get() if context is None else context),
+        "model": model_id,
+        "status": status,
+        "latency": round(latency, 3) if latency is not None else None,
+        **usage_from_response(response),
+    })
+
+
+def record_chapter(valid_questions: int, seconds: float):
+    """One generated chapter: how many questions it yielded and how long it took."""
+    if _ledger is None:
+        return
+    _ledger.append({
+        "kind": "chapter",
+        "at": time.time(),
+        **LEDGER_CONTEXT.get(),
+        "valid_questions": valid_questions,
+        "seconds": round(seconds, 3),
+    })
+
+
+# ======== Report ========
+def call_cost(row: dict, prices: dict) -> float:
+    price = prices.get(row.get("model"), {})
+    return (row.get("input_tokens", 0) * price.get("input", 0) +
+            row.get("output_tokens", 0) * price.get("output", 0)) / 1e6
+
+
+def summarize(rows: list, prices: dict = None) -> dict:
+    """Totals per run and per prompt version, plus every chapter's generation time."""
+    prices = prices or {}
+    runs, versions, chapters = {}, {}, []
+
+    def bucket(table, key):
+        return table.setdefault(key, {"calls": 0, "retries": 0, "errors": 0, "input_tokens": 0,
+                                      "output_tokens": 0, "total_tokens": 0, "cost": 0.0,
+                                      "chapters": 0, "valid_questions": 0})
+
+    for row in rows:
+        run_totals = bucket(runs, row.get("run_id", "-"))
+        if row["kind"] == "chapter":
+            chapters.append(row)
+            run_totals["chapters"] += 1
+            run_totals["valid_questions"] += row["valid_questions"]
+            continue
+        for totals in (run_totals, bucket(versions, row.get("prompt_version", "-"))):
+            totals["calls"] += 1
+            totals["retries"] += 1 if row.get("attempt", 0) else 0
+            totals["errors"] += 1 if row.get("status") != "ok" else 0
+            for name in ("input_tokens", "output_tokens", "total_tokens"):
+                totals[name] += row.get(name, 0)
+            totals["cost"] += call_cost(row, prices)
+
+    # Valid questions per prompt version come from the runs that used it
+    run_versions = {}
+    for row in rows:
+        if row["kind"] == "call" and row.get("prompt_version"):
+            run_versions.setdefault(row.get("run_id", "-"), set()).add(row["prompt_version"])
+    for run_id, versions_used in run_versions.items():
+        if len(versions_used) == 1:
+            bucket(versions, next(iter(versions_used)))["valid_questions"] += runs[run_id]["valid_questions"]
+
+    for table in (runs, versions):
+        for totals in table.values():
+            totals["tokens_per_question"] = (round(totals["total_tokens"] / totals["valid_questions"], 1)
+                                             if totals["valid_questions"] else None)
+    return {"runs": runs, "prompt_versions": versions, "chapters": chapters}
+
+
+def print_report(summary: dict, top: int = 10):
+    header = f"{'':<28}{'calls':>7}{'retries':>9}{'errors':>8}{'in tok':>11}{'out tok':>11}{'cost $':>10}{'valid Q':>9}{'tok/Q':>9}"
+
+    def line(name, t):
+        per_q = f"{t['tokens_per_question']:.0f}" if t["tokens_per_question"] else "-"
+        return (f"{name:<28}{t['calls']:>7}{t['retries']:>9}{t['errors']:>8}{t['input_tokens']:>11}"
+                f"{t['output_tokens']:>11}{t['cost']:>10.4f}{t['valid_questions']:>9}{per_q:>9}")
+
+    print("📒 Runs")
+    print(header)
+    for run_id, totals in sorted(summary["runs"].items()):
+        print(line(run_id, totals))
+
+    print("\n📒 Prompt versions")
+    print(header)
+    for version, totals in sorted(summary["prompt_versions"].items()):
+        print(line(f"v{version}", totals))
+
+    print(f"\n🐢 Slowest chapters (top {top})")
+    for row in sorted(summary["chapters"], key=lambda r: r["seconds"], reverse=True)[:top]:
+        print(f"  {row['seconds']:>8.1f}s  {row.get('chapter', '-'):<24} {row['valid_questions']:>3} questions  run {row.get('run_id', '-')}")
+
+
+def main(argv=None) -> int:
+    from config import app_config
+
+    ledger_config = app_config.get("ledger", {})
+    parser = argparse.ArgumentParser(description="Token and cost report from the quiz generation ledger.")
+    parser.add_argument("--path", type=str, default=ledger_config.get("path", "data/token_ledger.jsonl"), help="Ledger file")
+    parser.add_argument("--run", type=str, help="Only this run id")
+    parser.add_argument("--all", action="store_true", help="Every run instead of the latest one")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest chapters to list")
+    args = parser.parse_args(argv)
+
+    rows = TokenLedger(args.path).read()
+    if not rows:
+        print(f"⚠️ No ledger entries in {args.path}")
+        return 0
+    if args.run or not args.all:
+        run_id = args.run or max(rows, key=lambda r: r["at"]).get("run_id")
+        rows = [r for r in rows if r.get("run_id") == run_id]
+
+    print_report(summarize(rows, ledger_config.get("prices")), top=args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+# backend/loadtest_app.py
+# -*- coding: utf-8 -*-
+#
+# Offline load test for the Gradio quiz app (app.py).
+#
+# The Blocks app is launched locally with the model replaced by a fake agent
+# that replays recorded replies (bench/recorded_responses.json) after a
+# configurable latency. N simulated users then drive it over HTTP, each with
+# its own Gradio session: generate → answer → next → ... → back, repeatedly.
+# Run from the repo root (config.py reads backend/config/app_config.yaml):
+#
+#   python backend/loadtest_app.py --sessions 20 --latency 2
+#   python backend/loadtest_app.py --sessions 50 --latency 1.5 --spread 0.6 --latency-dist lognormal
+#   python backend/loadtest_app.py --sessions 50 --concurrency-limit 8 --json results.json
+#
+# Every story carries a session tag that the fake agent copies into its
+# questions, so a session that is shown another session's question (or the
+# wrong question number) is counted as state corruption, separately from
+# request errors.
+
+import os
+import io
+import re
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+import multiprocessing
+import contextlib
+from types import SimpleNamespace
+
+# app.py lives in the repo root, one level above this file
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from gradio_client import Client
+
+from bench_pipeline import BENCH_CHAPTER_TEXT, RECORDINGS_FILE, FakeAgent, load_recordings, offline_fakes
+from indic_quiz_generator_pipeline import parse_quiz_reply
+
+ACTIONS = ("generate", "answer", "next", "back")
+SESSION_TAG = re.compile(r"Session ([0-9a-f]{8})\.")
+
+
+class LatencyAgent(FakeAgent):
+    """FakeAgent that waits like a model would and tags questions with the story's session."""
+
+    def __init__(self, recordings: dict, latency: float, spread: float = 0.0, dist: str = "fixed"):
+        super().__init__(recordings)
+        self.latency = latency
+        self.spread = spread
+        self.dist = dist
+        self.lock = threading.Lock()  # replies are shared cycles
+
+    def delay(self) -> float:
+        if self.dist == "uniform":
+            return max(0.0, random.uniform(self.latency - self.spread, self.latency + self.spread))
+        if self.dist == "lognormal":  # median `latency`, long right tail
+            return random.lognormvariate(math.log(max(self.latency, 1e-3)), self.spread)
+        return self.latency
+
+    def run(self, prompt: str):
+        time.sleep(self.delay())
+        with self.lock:
+            reply = super().run(prompt)
+        match = SESSION_TAG.search(prompt)
+        if match is None:
+            return reply
+        qtype = "MCQ" if '"Question_type": MCQ' in prompt else "SCQ"
+        quiz = parse_quiz_reply(reply.content, qtype)
+        for q in quiz.get("Questions", []):
+            q["Question"] = f"[{match.group(1)}] {q['Question']}"
+        return SimpleNamespace(content=json.dumps({"Quiz": quiz}, ensure_ascii=False))
+
+
+# ======== Simulated user ========
+def screen(outputs) -> dict:
+    """
+    The quiz screen from an event's outputs: the question markdown and the
+    options of whichever of the radio / checkbox group is visible.
+    """
+    updates = [o for o in outputs if isinstance(o, dict)]
+    text = next((u.get("value") for u in updates if isinstance(u.get("value"), str)), "")
+    visible = [u for u in updates if u.get("choices") and u.get("visible", True)]
+    choices = [c[0] if isinstance(c, (list, tuple)) else c for c in (visible[0]["choices"] if visible else [])]
+    multiple = bool(visible) and isinstance(visible[0].get("value"), list)
+    return {"text": text, "choices": choices, "multiple": multiple}
+
+
+class SimulatedUser:
+    """One browser session: its own Gradio client (session hash) and story tag."""
+
+    def __init__(self, url: str, answers_per_quiz: int, think_time: float, results: "Results"):
+        self.client = Client(url, verbose=False)
+        self.tag = uuid.uuid4().hex[:8]
+        self.story = f"Session {self.tag}.\n{BENCH_CHAPTER_TEXT}"
+        self.answers_per_quiz = answers_per_quiz
+        self.think_time = think_time
+        self.results = results
+
+    def call(self, action: str, api_name: str, *args):
+        started = time.perf_counter()
+        try:
+            outputs = self.client.predict(*args, api_name=api_name)
+        except Exception as e:
+            self.results.record(action, time.perf_counter() - started, error=f"{type(e).__name__}: {e}")
+            return None
+        self.results.record(action, time.perf_counter() - started)
+        return outputs if isinstance(outputs, (list, tuple)) else [outputs]
+
+    def check(self, action: str, ok: bool, detail: str):
+        if not ok:
+            self.results.corrupted(action, f"session {self.tag}: {detail}")
+        return ok
+
+    def expect_question(self, action: str, current: dict, number: int) -> bool:
+        ok = self.check(action, f"**Question {number} of" in current["text"],
+                        f"expected question {number}, got {current['text'][:60]!r}")
+        return ok and self.check(action, f"[{self.tag}]" in current["text"],
+                                 f"question from another session: {current['text'][:60]!r}")
+
+    def journey(self):
+        outputs = self.call("generate", "/generate_quiz", "Load test", self.story)
+        if outputs is None:
+            return
+        current = screen(outputs)
+        if not self.expect_question("generate", current, 1):
+            return
+
+        for number in range(1, self.answers_per_quiz + 1):
+            time.sleep(self.think_time)
+            if current["multiple"]:
+                outputs = self.call("answer", "/submit_mcq", current["choices"][:2])
+            else:
+                outputs = self.call("answer", "/submit_scq", current["choices"][0])
+            if outputs is None:
+                return
+            feedback = next((o for o in outputs if isinstance(o, str)), "")
+            if not self.check("answer", feedback.startswith(("✅", "❌")), f"unexpected feedback {feedback[:60]!r}"):
+                return
+
+            outputs = self.call("next", "/next_question")
+            if outputs is None:
+                return
+            current = screen(outputs)
+            if "Quiz complete" in current["text"]:
+                break
+            if not self.expect_question("next", current, number + 1):
+                return
+
+        self.call("back", "/go_back")
+        self.results.journey_done()
+
+    def run(self, journeys: int, deadline: float):
+        for _ in range(journeys):
+            if time.monotonic() > deadline:
+                break
+            self.journey()
+
+
+# ======== Results ========
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {action: [] for action in ACTIONS}
+        self.errors = {action: 0 for action in ACTIONS}
+        self.corruptions = {action: 0 for action in ACTIONS}
+        self.samples = []  # first few error / corruption messages
+        self.journeys = 0
+
+    def record(self, action: str, seconds: float, error: str = None):
+        with self.lock:
+            self.latencies[action].append(seconds)
+            if error:
+                self.errors[action] += 1
+                self._sample(f"{action}: {error}")
+
+    def corrupted(self, action: str, detail: str):
+        with self.lock:
+            self.corruptions[action] += 1
+            self._sample(f"{action} state: {detail}")
+
+    def journey_done(self):
+        with self.lock:
+            self.journeys += 1
+
+    def _sample(self, message: str):
+        if len(self.samples) < 10:
+            self.samples.append(message)
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(results: Results, elapsed: float, sessions: int) -> dict:
+    actions = {}
+    for action in ACTIONS:
+        latencies = results.latencies[action]
+        count = len(latencies)
+        actions[action] = {
+            "requests": count,
+            "errors": results.errors[action],
+            "corruptions": results.corruptions[action],
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+            "p90_ms": round(percentile(latencies, 0.90) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            "max_ms": round(max(latencies, default=0.0) * 1000, 1),
+        }
+    requests = sum(a["requests"] for a in actions.values())
+    return {
+        "sessions": sessions,
+        "elapsed_s": round(elapsed, 2),
+        "journeys": results.journeys,
+        "journeys_per_s": round(results.journeys / elapsed, 3) if elapsed else 0.0,
+        "requests_per_s": round(requests / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(sum(results.errors.values()) / requests, 4) if requests else 0.0,
+        "corruption_rate": round(sum(results.corruptions.values()) / requests, 4) if requests else 0.0,
+        "actions": actions,
+        "samples": results.samples,
+    }
+
+
+def print_report(summary: dict):
+    print(f"\n👥 {summary['sessions']} sessions, {summary['elapsed_s']}s: "
+          f"{summary['journeys']} journeys ({summary['journeys_per_s']}/s), {summary['requests_per_s']} requests/s")
+    print(f"{'':<10}{'requests':>10}{'errors':>8}{'corrupt':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for action, a in summary["actions"].items():
+        print(f"{action:<10}{a['requests']:>10}{a['errors']:>8}{a['corruptions']:>9}"
+              f"{a['p50_ms']:>10.1f}{a['p90_ms']:>10.1f}{a['p99_ms']:>10.1f}{a['max_ms']:>10.1f}")
+    print(f"❗ Error rate {summary['error_rate']:.2%}, state corruption rate {summary['corruption_rate']:.2%}")
+    for message in summary["samples"]:
+        print(f"   {message[:200]}")
+
+
+# ======== Runner ========
+def serve_app(args, ready, stop):
+    """
+    Child process: the app with the fake agent. Kept out of the load
+    generator's process so the clients do not compete with it for the GIL.
+    """
+    import app  # builds the Blocks; its module-level setup must see the fakes
+
+    recordings = load_recordings(args.recordings)
+    agent_factory = lambda model_id: LatencyAgent(recordings, args.latency, args.spread, args.latency_dist)
+    with offline_fakes(recordings, agent_factory), contextlib.redirect_stdout(io.StringIO()):
+        if args.concurrency_limit:
+            app.demo.queue(default_concurrency_limit=args.concurrency_limit)
+        app.demo.launch(server_name="127.0.0.1", server_port=args.port, prevent_thread_lock=True, quiet=True)
+        ready.set()
+        stop.wait()
+        app.demo.close()
+
+
+def run_load_test(args) -> dict:
+    context = multiprocessing.get_context("spawn")
+    ready, stop = context.Event(), context.Event()
+    server = context.Process(target=serve_app, args=(args, ready, stop), daemon=True)
+    server.start()
+    try:
+        if not ready.wait(timeout=120):
+            raise RuntimeError("The app did not start within 120s")
+
+        results = Results()
+        url = f"http://127.0.0.1:{args.port}/"
+        users = [SimulatedUser(url, args.answers, args.think_time, results) for _ in range(args.sessions)]
+        deadline = time.monotonic() + args.duration
+        threads = []
+        started = time.perf_counter()
+        for i, user in enumerate(users):
+            thread = threading.Thread(target=user.run, args=(args.journeys, deadline), daemon=True)
+            threads.append(thread)
+            thread.start()
+            if args.ramp and i < len(users) - 1:
+                time.sleep(args.ramp / len(users))
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        stop.set()
+        server.join(timeout=30)
+
+    return summarize(results, elapsed, args.sessions)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test for the Gradio quiz app.")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent simulated users")
+    parser.add_argument("--journeys", type=int, default=3, help="generate→answer→next→back rounds per user")
+    parser.add_argument("--answers", type=int, default=10, help="Questions answered per quiz before going back")
+    parser.add_argument("--duration", type=float, default=600, help="Stop starting new journeys after this many seconds")
+    parser.add_argument("--ramp", type=float, default=0.0, help="Seconds over which users are started")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds a user waits before each answer")
+    parser.add_argument("--latency", type=float, default=1.0, help="Fake model latency in seconds (median for lognormal)")
+    parser.add_argument("--spread", type=float, default=0.0, help="± range (uniform) or sigma (lognormal) of the latency")
+    parser.add_argument("--latency-dist", choices=("fixed", "uniform", "lognormal"), default="fixed")
+    parser.add_argument("--recordings", type=str, default=RECORDINGS_FILE, help="Recorded replies to replay")
+    parser.add_argument("--concurrency-limit", type=int, help="Override Gradio's per-event concurrency limit (default: as app.py ships)")
+    parser.add_argument("--port", type=int, default=7870)
+    parser.add_argument("--max-error-rate", type=float, default=0.0, help="Exit non-zero above this error + corruption rate")
+    parser.add_argument("--json", type=str, help="Also write the summary to this file")
+    args = parser.parse_args(argv)
+
+    summary = run_load_test(args)
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    failing = summary["error_rate"] + summary["corruption_rate"] > args.max_error_rate
+    return 1 if failing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
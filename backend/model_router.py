@@ -0,0 +1,209 @@
+# backend/model_router.py
+
+import time
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class RoutesOpenError(RuntimeError):
+    """Every model's circuit breaker is open, so no call was made."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive errors and half-opens after
+    `reset_after` seconds. Half-open lets a single probe call through; the rest
+    are refused until it succeeds (closes) or fails (re-opens). A probe that
+    never reports back is replaced after another `reset_after` seconds.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_after: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.probe_at = None
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_after:
+                return False
+            if self.probe_at is not None and now - self.probe_at < self.reset_after:
+                return False  # a probe is already in flight
+            self.probe_at = now
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probe_at = None
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ModelRouter:
+    """
+    Drop-in replacement for `agent.run` that routes a prompt across several models:
+    - every call has a deadline,
+    - once the primary model is slower than its `hedge_percentile` latency, a hedged
+      duplicate goes to the next model and the first valid reply wins,
+    - models with repeated errors are skipped by a circuit breaker until they cool down.
+
+    `on_call(model_id, response, latency, status)` is invoked for every call,
+    hedges and losers included, in a copy of the caller's context.
+    """
+
+    def __init__(self, model_ids: list, agent_factory, deadline: float = 90.0, hedge_percentile: float = 0.95,
+                 min_samples: int = 5, is_valid=None, failure_threshold: int = 3, reset_after: float = 60.0,
+                 max_workers: int = 8, on_call=None):
+        if not model_ids:
+            raise ValueError("ModelRouter needs at least one model id")
+        self.model_ids = list(model_ids)
+        self.agent_factory = agent_factory
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.is_valid = is_valid or (lambda response: bool(getattr(response, "content", None)))
+        self.on_call = on_call
+
+        self.latencies = {m: deque(maxlen=200) for m in self.model_ids}
+        self.breakers = {m: CircuitBreaker(failure_threshold, reset_after) for m in self.model_ids}
+        self.local = threading.local()
+        self.agent_local = threading.local()
+        # Abandoned (losing) calls keep a worker until the client timeout fires,
+        # so this pool is shared by all calls through the router.
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-router")
+
+    def get_agent(self, model_id: str):
+        """Agent for `model_id` owned by the calling worker thread; agents keep run state and are not shared."""
+        agents = getattr(self.agent_local, "agents", None)
+        if agents is None:
+            agents = self.agent_local.agents = {}
+        if model_id not in agents:
+            agents[model_id] = self.agent_factory(model_id)
+        return agents[model_id]
+
+    def hedge_delay(self, model_id: str):
+        """Latency percentile of `model_id`, or None until enough calls have been seen."""
+        samples = sorted(self.latencies[model_id])
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(self.hedge_percentile * len(samples)))]
+
+    def last_model(self) -> str:
+        """Model that produced the last reply returned to the calling thread."""
+        return getattr(self.local, "model_id", self.model_ids[0])
+
+    def _call(self, model_id: str, prompt: str):
+        start = time.monotonic()
+        try:
+            response = self.get_agent(model_id).run(prompt)
+        except Exception:
+            if self.on_call:
+                self.on_call(model_id, None, time.monotonic() - start, "error")
+            raise
+        latency = time.monotonic() - start
+        valid = self.is_valid(response)
+        if self.on_call:
+            self.on_call(model_id, response, latency, "ok" if valid else "invalid")
+        return response, latency, valid
+
+    def run(self, prompt: str):
+        candidates = list(self.model_ids)
+        deadline_at = time.monotonic() + self.deadline
+        pending = {}
+        errors = []
+
+        def next_allowed():
+            # Breakers are asked only when a model is about to be called, so a
+            # half-open model's single probe is not spent on a call never made.
+            while candidates:
+                model_id = candidates.pop(0)
+                if self.breakers[model_id].allow():
+                    return model_id
+            return None
+
+        def launch(model_id):
+            # Each call gets its own copy: one context cannot be entered by two threads
+            context = contextvars.copy_context()
+            pending[self.executor.submit(context.run, self._call, model_id, prompt)] = model_id
+            return model_id
+
+        primary = next_allowed()
+        if primary is None:
+            raise RoutesOpenError(f"All routes open: {', '.join(self.model_ids)} are cooling down after repeated errors")
+        launch(primary)
+        hedge_at = None
+        delay = self.hedge_delay(primary)
+        if delay is not None and candidates:
+            hedge_at = time.monotonic() + delay
+
+        while pending:
+            now = time.monotonic()
+            if now >= deadline_at:
+                break
+            wake_at = min(deadline_at, hedge_at) if hedge_at else deadline_at
+            done, _ = wait(pending, timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+
+            if not done and hedge_at and time.monotonic() >= hedge_at:
+                hedge_at = None
+                hedged = next_allowed()
+                if hedged is not None:
+                    launch(hedged)
+                    print(f"⏳ {primary} is slower than p{int(self.hedge_percentile * 100)}; hedging with {hedged}")
+                continue
+
+            for future in done:
+                model_id = pending.pop(future)
+                try:
+                    response, latency, valid = future.result()
+                except Exception as e:
+                    self.breakers[model_id].record_failure()
+                    errors.append(f"{model_id}: {e}")
+                    print(f"❌ {model_id} failed: {e}")
+                    continue
+
+                self.latencies[model_id].append(latency)
+                if valid:
+                    self.breakers[model_id].record_success()
+                    self.local.model_id = model_id
+                    for other in pending:
+                        other.cancel()  # only stops calls that have not started yet
+                    return response
+
+                self.breakers[model_id].record_failure()
+                errors.append(f"{model_id}: invalid reply")
+                print(f"❌ {model_id} returned an invalid reply")
+
+            # Every in-flight call failed: fall back to the next healthy model
+            if not pending:
+                fallback = next_allowed()
+                if fallback is not None:
+                    print(f"↪️ Falling back to {fallback}")
+                    launch(fallback)
+                    hedge_at = None
+
+        if not pending:
+            raise RuntimeError(f"No valid reply from {', '.join(self.model_ids)}: {'; '.join(errors)}")
+
+        for future, model_id in pending.items():
+            future.cancel()
+            # A timed-out call took at least the deadline; leaving it out would
+            # keep the hedge percentile low exactly when the model is slow.
+            self.latencies[model_id].append(self.deadline)
+            self.breakers[model_id].record_failure()
+            errors.append(f"{model_id}: no reply within {self.deadline}s")
+
+        raise TimeoutError(f"No valid reply from {', '.join(self.model_ids)}: {'; '.join(errors)}")
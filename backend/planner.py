@@ -0,0 +1,100 @@
+# backend/planner.py
+
+import os
+import json
+import math
+import fcntl
+import threading
+
+from chapter_manifest import write_json_atomic
+
+PLANNING_SETTINGS = {
+    "words_per_question": 40,   # passage length that supports one distinct question
+    "min_questions": 5,         # bounds for chapters without an explicit count
+    "max_questions": 20,
+    "safety_margin": 1.15,      # head-room on top of the expected yield
+    "prior_weight": 20,         # pseudo-questions behind the default yields
+}
+
+# Share of requested questions that end up in the quiz, before any history:
+# SCQs are rarely dropped; about half of the MCQs are discarded as single-answer
+# or as near-duplicates of an SCQ.
+DEFAULT_YIELD = {"SCQ": 0.9, "MCQ": 0.5}
+
+
+def configure_planning(settings: dict = None):
+    PLANNING_SETTINGS.update(settings or {})
+
+
+def chapter_capacity(chapter_text: str) -> int:
+    """Distinct questions the passage can reasonably support."""
+    return max(1, len(chapter_text.split()) // PLANNING_SETTINGS["words_per_question"])
+
+
+def suggest_question_count(chapter_text: str) -> int:
+    """Quiz size for a chapter that has no entry in `chapter_question_counts`."""
+    return max(PLANNING_SETTINGS["min_questions"], min(PLANNING_SETTINGS["max_questions"], chapter_capacity(chapter_text)))
+
+
+def split_targets(num_questions: int) -> dict:
+    # SCQ gets the extra question if odd
+    half = num_questions // 2
+    return {"SCQ": half + num_questions % 2, "MCQ": half}
+
+
+class RunStats:
+    """
+    Historical yield per model and question type: how many questions were
+    requested (first call plus repairs) and how many were usable (valid, not
+    duplicates), whether or not the quiz needed all of them.
+    Stored as {"<model>|<type>": {"requested": n, "kept": k, "runs": r}}.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = self._read()
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def yield_rate(self, model_id: str, question_type: str) -> float:
+        """Observed yield, smoothed towards DEFAULT_YIELD while there is little history."""
+        entry = self.entries.get(f"{model_id}|{question_type}", {})
+        prior = PLANNING_SETTINGS["prior_weight"]
+        kept = entry.get("kept", 0) + prior * DEFAULT_YIELD[question_type]
+        return kept / (entry.get("requested", 0) + prior)
+
+    def record(self, model_id: str, question_type: str, requested: int, kept: int):
+        if not requested:
+            return
+        with self.lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Merge with whatever other workers recorded since we loaded the file
+            with open(self.path + ".lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self.entries = self._read()
+                entry = self.entries.setdefault(f"{model_id}|{question_type}", {"requested": 0, "kept": 0, "runs": 0})
+                entry["requested"] += requested
+                entry["kept"] += min(kept, requested)
+                entry["runs"] += 1
+                write_json_atomic(self.path, self.entries)
+
+
+def plan_requests(num_questions: int, stats: RunStats, models: dict) -> dict:
+    """
+    Returns {question_type: {"target": n, "request": m}}: how many questions of
+    each type the quiz needs, and how many to ask the model for so the target
+    is met on the first call given its historical yield. Requests stay
+    between the target and `num_questions` (the fixed per-type size that was
+    requested before planning).
+    """
+    plan = {}
+    for question_type, target in split_targets(num_questions).items():
+        rate = stats.yield_rate(models[question_type], question_type)
+        request = math.ceil(target / max(rate, 0.05) * PLANNING_SETTINGS["safety_margin"])
+        plan[question_type] = {"target": target, "request": max(target, min(request, num_questions))}
+    return plan
@@ -0,0 +1,133 @@
+# backend/postprocess.py
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from indic_quiz_generator_pipeline import finalize_questions
+
+# Questions cross the process boundary as flat tuples in this field order
+# (plus a bitmask of the fields present and a dict of any other keys), not as
+# dicts that repeat every key name per question.
+QUESTION_FIELDS = ("Question", "Question_type", "Options", "Right_Option", "Number_Of_Points_Earned",
+                   "Chapter", "Timer")
+
+
+def pack_questions(questions: list) -> list:
+    packed = []
+    for q in questions:
+        if not isinstance(q, dict):
+            packed.append((-1, q))  # left as-is for the validators to flag
+            continue
+        present = 0
+        values = []
+        for bit, field in enumerate(QUESTION_FIELDS):
+            if field in q:
+                present |= 1 << bit
+            value = q.get(field)
+            values.append(tuple(value) if field == "Options" and isinstance(value, list) else value)
+        extra = {k: v for k, v in q.items() if k not in QUESTION_FIELDS} or None
+        packed.append((present, *values, extra))
+    return packed
+
+
+def unpack_questions(packed: list) -> list:
+    questions = []
+    for record in packed:
+        if record[0] == -1:
+            questions.append(record[1])
+            continue
+        present, *values, extra = record
+        q = {}
+        for bit, (field, value) in enumerate(zip(QUESTION_FIELDS, values)):
+            if present & (1 << bit):
+                q[field] = list(value) if field == "Options" and isinstance(value, tuple) else value
+        q.update(extra or {})
+        questions.append(q)
+    return questions
+
+
+# ======== Chunk jobs (run in the worker processes) ========
+def finalize_chunk(items: list) -> list:
+    """[(packed SCQs, packed MCQs, targets), ...] -> [(packed questions, usable counts), ...]."""
+    results = []
+    for scq, mcq, targets in items:
+        questions, usable = finalize_questions(unpack_questions(scq), unpack_questions(mcq), targets)
+        results.append((pack_questions(questions), usable))
+    return results
+
+
+def rows_chunk(items: list) -> list:
+    """[packed questions, ...] -> [(columns, rows), ...] as saved in the "parsed" checkpoint."""
+    from gurukula_quizgen import quiz_json_to_dataframe  # imports this module
+
+    tables = []
+    for packed in items:
+        df = quiz_json_to_dataframe({"Questions": unpack_questions(packed)})
+        tables.append((df.columns.tolist(), df.values.tolist()))
+    return tables
+
+
+class PostProcessPool:
+    """
+    Runs the CPU-bound stages of many chapters at once (MCQ filtering and
+    difflib dedup, answer balancing, DataFrame building) in `workers`
+    processes, in chunks of `chunk_size` items, so large batches scale past
+    the GIL. Only batch passes over many chapters use it; a single reply is
+    cheaper to handle inline than to ship to a worker. `submit_finalize`
+    lets a batch run generate the next chapters while a pass runs. With one
+    worker everything runs inline and no processes are started.
+    """
+
+    def __init__(self, workers: int = 1, chunk_size: int = 16):
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+        self.executor = None
+        if self.workers > 1:
+            # forkserver: workers do not inherit the generation threads and locks of the parent
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context("forkserver"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def _submit(self, job, items: list):
+        """Starts `job` over `items` in chunks; returns a function that waits for the results."""
+        if self.executor is None:
+            results = job(items)
+            return lambda: results
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        futures = [self.executor.submit(job, chunk) for chunk in chunks]
+        return lambda: [result for future in futures for result in future.result()]
+
+    def _run(self, job, items: list) -> list:
+        return self._submit(job, items)()
+
+    def warm_up(self):
+        """Starts every worker (and its imports) before timing-sensitive work."""
+        if self.executor is not None:
+            list(self.executor.map(finalize_chunk, [[] for _ in range(self.workers)]))
+
+    def finalize_many(self, items: list) -> list:
+        """[(scq_questions, mcq_questions, targets), ...] -> [(questions, usable counts), ...]."""
+        return self.submit_finalize(items)()
+
+    def submit_finalize(self, items: list):
+        """
+        finalize_many in the background: returns a function that waits for and
+        returns its results, so the caller can make model calls in the meantime.
+        """
+        packed = [(pack_questions(scq), pack_questions(mcq), targets) for scq, mcq, targets in items]
+        collect = self._submit(finalize_chunk, packed)
+        return lambda: [(unpack_questions(questions), usable) for questions, usable in collect()]
+
+    def tables_many(self, question_lists: list) -> list:
+        """[questions, ...] -> [(columns, rows), ...] from quiz_json_to_dataframe."""
+        return self._run(rows_chunk, [pack_questions(questions) for questions in question_lists])
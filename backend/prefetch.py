@@ -0,0 +1,85 @@
+# backend/prefetch.py
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from chapter_manifest import content_hash
+
+
+class QuizPrefetcher:
+    """
+    Generates follow-up quizzes for a story in the background, so "try again"
+    can be served without waiting for the model. Ready (or in-flight) quizzes
+    are shared per story; each session may schedule at most `max_per_session`
+    prefetches and at most `max_pending` run at once across all sessions, so
+    idle browsing cannot burn through the model quota.
+    """
+
+    def __init__(self, generate_fn, max_workers: int = 2, max_pending: int = 4, max_per_session: int = 3,
+                 max_stories: int = 64):
+        self.generate_fn = generate_fn  # (story, avoid_questions) -> [question dict, ...]
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quiz-prefetch")
+        self.max_pending = max_pending
+        self.max_per_session = max_per_session
+        self.max_stories = max_stories
+        self.quizzes = OrderedDict()  # story key -> [Future, ...], least recently used first
+        self.scheduled = {}           # session id -> prefetches scheduled
+        self.lock = threading.Lock()
+
+    def pending_count(self) -> int:
+        return sum(1 for futures in self.quizzes.values() for f in futures if not f.done())
+
+    def prefetch(self, session_id: str, story: str, avoid_questions: list = None) -> bool:
+        """Schedules one follow-up quiz unless one is already queued or a budget is used up."""
+        key = content_hash(story)
+        with self.lock:
+            if self.quizzes.get(key):
+                return False
+            if self.scheduled.get(session_id, 0) >= self.max_per_session:
+                return False
+            if self.pending_count() >= self.max_pending:
+                return False
+            self.scheduled[session_id] = self.scheduled.get(session_id, 0) + 1
+            future = self.executor.submit(self.generate_fn, story, list(avoid_questions or []))
+            self.quizzes.setdefault(key, []).append(future)
+            self.quizzes.move_to_end(key)
+            while len(self.quizzes) > self.max_stories:
+                self.quizzes.popitem(last=False)
+        future.add_done_callback(lambda f: self._drop_failed(key, f))
+        return True
+
+    def _drop_failed(self, key: str, future):
+        if future.cancelled() or future.exception() is None:
+            return
+        print(f"⚠️ Prefetch failed: {future.exception()}")
+        with self.lock:
+            if future in self.quizzes.get(key, []):
+                self.quizzes[key].remove(future)
+
+    def take(self, story: str, timeout: float = None):
+        """
+        A prefetched quiz for `story`, waiting up to `timeout` seconds for one
+        still being generated; None if there is none (or it failed).
+        """
+        key = content_hash(story)
+        with self.lock:
+            futures = self.quizzes.get(key)
+            if not futures:
+                return None
+            # Prefer a finished quiz over one still in flight
+            future = next((f for f in futures if f.done()), futures[0])
+            futures.remove(future)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            with self.lock:
+                self.quizzes.setdefault(key, []).insert(0, future)  # still useful next time
+            return None
+        except Exception:
+            return None
+
+    def forget(self, session_id: str):
+        """Releases a closed session's budget; its prefetched quizzes stay available for the story."""
+        with self.lock:
+            self.scheduled.pop(session_id, None)
@@ -0,0 +1,228 @@
+# backend/question_bank.py
+
+import os
+import mmap
+import json
+import numbers
+import struct
+import hashlib
+import tempfile
+
+# Layout (little-endian):
+#   header   MAGIC, version, record count, column count, slot count,
+#            and (offset, length) of the metadata, records, slots and strings blocks
+#   metadata JSON: {"columns": [...], "numeric": [...],
+#                   "chapters": {title: {"start", "count", "types": {type: [start, count]}}}}
+#            "numeric" lists the integer columns (Timer, Points), converted back to int on read
+#   records  per question, per column: (u32 offset into strings, u32 length)
+#   slots    open-addressing hash table: (u64 hash of question id, u32 record index)
+#   strings  UTF-8 text; identical values (chapter, type, timer, ...) are stored once
+MAGIC = b"QUIZBANK"
+VERSION = 1
+HEADER = struct.Struct("<8sIIII8Q")
+FIELD = struct.Struct("<II")
+SLOT = struct.Struct("<QI")
+EMPTY_SLOT = 0xFFFFFFFF
+
+ID_COLUMN = "Question ID"
+CHAPTER_COLUMN = "Chapter Title"
+TYPE_ORDER = ("SCQ", "MCQ")
+
+
+def question_id(chapter_title: str, question: str) -> str:
+    """Stable id from the chapter and question text, so re-exports keep ids."""
+    return hashlib.sha1(f"{chapter_title}\n{question}".encode("utf-8")).hexdigest()[:12]
+
+
+def _id_hash(qid: str) -> int:
+    return int.from_bytes(hashlib.blake2b(qid.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def write_question_bank(path: str, tables: dict):
+    """
+    Writes `tables` ({chapter_title: DataFrame from quiz_json_to_dataframe}) as
+    one memory-mappable file. Questions are grouped by chapter, then type, so
+    each (chapter, type) is a contiguous range of records.
+    """
+    columns = [ID_COLUMN, CHAPTER_COLUMN]
+    for df in tables.values():
+        columns.extend(c for c in df.columns if c not in columns)
+
+    rows, chapters, seen_ids = [], {}, set()
+    for chapter_title, df in tables.items():
+        records = df.to_dict("records")
+        records.sort(key=lambda r: TYPE_ORDER.index(r["Type"]) if r.get("Type") in TYPE_ORDER else len(TYPE_ORDER))
+        entry = {"start": len(rows), "count": 0, "types": {}}
+        for record in records:
+            qid = question_id(chapter_title, str(record.get("Question", "")))
+            if qid in seen_ids:
+                continue  # the same question twice in a chapter
+            seen_ids.add(qid)
+            qtype = str(record.get("Type", ""))
+            span = entry["types"].setdefault(qtype, [len(rows), 0])
+            span[1] += 1
+            entry["count"] += 1
+            rows.append({**record, ID_COLUMN: qid, CHAPTER_COLUMN: chapter_title})
+        chapters[chapter_title] = entry
+
+    def is_integer(value) -> bool:
+        return isinstance(value, numbers.Integral) and not isinstance(value, bool)
+
+    numeric = [column for column in columns
+               if any(column in row for row in rows) and all(is_integer(row[column]) for row in rows if column in row)]
+
+    strings, interned = bytearray(), {}
+
+    def intern(value) -> tuple:
+        text = "" if value is None or value != value else str(value)  # NaN -> ""
+        if text not in interned:
+            data = text.encode("utf-8")
+            interned[text] = (len(strings), len(data))
+            strings.extend(data)
+        return interned[text]
+
+    records = bytearray()
+    for row in rows:
+        for column in columns:
+            records.extend(FIELD.pack(*intern(row.get(column))))
+
+    # Load factor <= 0.5 keeps probe chains short
+    num_slots = 1
+    while num_slots < 2 * max(1, len(rows)):
+        num_slots *= 2
+    slots = [None] * num_slots
+    for index, row in enumerate(rows):
+        h = _id_hash(row[ID_COLUMN])
+        slot = h & (num_slots - 1)
+        while slots[slot] is not None:
+            slot = (slot + 1) & (num_slots - 1)
+        slots[slot] = (h, index)
+    slot_bytes = b"".join(SLOT.pack(*(s or (0, EMPTY_SLOT))) for s in slots)
+
+    meta = json.dumps({"columns": columns, "numeric": numeric, "chapters": chapters}, ensure_ascii=False).encode("utf-8")
+    blocks, offset = [], HEADER.size
+    for block in (meta, records, slot_bytes, strings):
+        blocks.append((offset, len(block)))
+        offset += len(block)
+    header = HEADER.pack(MAGIC, VERSION, len(rows), len(columns), num_slots, *[v for b in blocks for v in b])
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".qbank")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for block in (header, meta, records, slot_bytes, strings):
+                f.write(block)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(rows)
+
+
+class QuestionBank:
+    """
+    Read-only, memory-mapped question bank. Opening it only parses the header
+    and the small metadata block; records are read from the mapping on access,
+    so a whole book costs little resident memory. Lookups by question id and
+    by (chapter, type) are O(1); `raw` returns a field's bytes without decoding
+    and `raw_view` a zero-copy memoryview of them. Integer columns (Timer,
+    Points) come back as int, empty ones as None.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self.num_records, self.num_columns, self.num_slots,
+         meta_off, meta_len, self.records_off, _, self.slots_off, _, self.strings_off, _) = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} question bank")
+
+        meta = json.loads(self.mm[meta_off:meta_off + meta_len])
+        self.columns = meta["columns"]
+        self.column_index = {name: i for i, name in enumerate(self.columns)}
+        self.numeric = set(meta.get("numeric", []))
+        self.chapter_index = meta["chapters"]
+        self.record_size = self.num_columns * FIELD.size
+
+    def close(self):
+        try:
+            self.mm.close()
+        except BufferError:
+            raise BufferError("Release the memoryviews returned by raw_view() before closing the question bank") from None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.num_records
+
+    def chapters(self) -> list:
+        return list(self.chapter_index)
+
+    def _span(self, index: int, column: str) -> tuple:
+        if not 0 <= index < self.num_records:
+            raise IndexError(index)
+        offset, length = FIELD.unpack_from(
+            self.mm, self.records_off + index * self.record_size + self.column_index[column] * FIELD.size)
+        return self.strings_off + offset, length
+
+    def raw(self, index: int, column: str) -> bytes:
+        """UTF-8 bytes of one field, copied out of the mapping (safe to keep after `close`)."""
+        start, length = self._span(index, column)
+        return self.mm[start:start + length]
+
+    def raw_view(self, index: int, column: str) -> memoryview:
+        """
+        UTF-8 bytes of one field as a memoryview into the mapping, without a copy.
+        Release every view (`view.release()` or `with bank.raw_view(...) as view:`)
+        before `close`, which raises BufferError while one is still held.
+        """
+        start, length = self._span(index, column)
+        return memoryview(self.mm)[start:start + length]
+
+    def field(self, index: int, column: str):
+        with self.raw_view(index, column) as view:
+            text = str(view, "utf-8")
+        if column in self.numeric:
+            return int(text) if text else None
+        return text
+
+    def record(self, index: int) -> dict:
+        return {column: self.field(index, column) for column in self.columns}
+
+    def find(self, qid: str):
+        """Record index of a question id, or None."""
+        h = _id_hash(qid)
+        mask = self.num_slots - 1
+        slot = h & mask
+        while True:
+            stored_hash, index = SLOT.unpack_from(self.mm, self.slots_off + slot * SLOT.size)
+            if index == EMPTY_SLOT:
+                return None
+            if stored_hash == h and self.raw(index, ID_COLUMN) == qid.encode("utf-8"):
+                return index
+            slot = (slot + 1) & mask
+
+    def get(self, qid: str):
+        index = self.find(qid)
+        return None if index is None else self.record(index)
+
+    def question_range(self, chapter_title: str, question_type: str = None) -> range:
+        """Record indices of a chapter, optionally of one question type."""
+        entry = self.chapter_index.get(chapter_title)
+        if entry is None:
+            return range(0)
+        if question_type is None:
+            return range(entry["start"], entry["start"] + entry["count"])
+        start, count = entry["types"].get(question_type.upper(), (0, 0))
+        return range(start, start + count)
+
+    def questions(self, chapter_title: str, question_type: str = None) -> list:
+        return [self.record(i) for i in self.question_range(chapter_title, question_type)]
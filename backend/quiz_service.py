@@ -0,0 +1,279 @@
+# backend/quiz_service.py
+# -*- coding: utf-8 -*-
+#
+# HTTP job service for quiz generation. Run from the repo root:
+#
+#   uvicorn quiz_service:app --app-dir backend --port 8000
+#
+# POST /jobs queues a chapter and returns a job id immediately; a bounded worker
+# pool runs the generation, and clients poll /jobs/{id}, stream /jobs/{id}/events,
+# fetch /jobs/{id}/result and trigger /jobs/{id}/publish.
+#
+# GET /chapters and /chapters/{title}/quiz serve the published (and possibly
+# hand-corrected) questions from an in-memory copy of the sheet, so learner
+# traffic costs no Sheets API calls (see sheet_sync.py).
+
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from config import app_config
+from chapter_manifest import content_hash
+from ledger import ledger_context, record_chapter
+from sheet_sync import open_sheet_sync
+from gurukula_quizgen import (
+    TRANSLATION_LANGUAGES,
+    generate_quiz_json,
+    translate_quiz_json,
+    quiz_json_to_dataframe,
+    upload_to_sheet,
+    apply_conditional_formatting,
+)
+
+SERVICE_CONFIG = app_config.get("service", {})
+MAX_WORKERS = SERVICE_CONFIG.get("max_workers", 4)
+MAX_QUEUED_JOBS = SERVICE_CONFIG.get("max_queued_jobs", 100)
+JOB_TTL_SECONDS = SERVICE_CONFIG.get("job_ttl_seconds", 3600)
+MAX_JOBS = SERVICE_CONFIG.get("max_jobs", 1000)
+
+TERMINAL_STATUSES = {"generated", "published", "failed"}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class JobRequest(BaseModel):
+    chapter_title: str = Field(..., min_length=1)
+    chapter_text: str = Field(..., min_length=1)
+    num_questions: int = Field(15, ge=1, le=100)
+
+
+class Job:
+    def __init__(self, request: JobRequest, key: str):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.request = request
+        self.status = "queued"
+        self.created_at = _now()
+        self.events = []
+        self.quiz = None
+        self.translated = False  # quiz carries the configured translations and can be published
+        self.spreadsheet_id = None
+        self.error = None
+        self.finished_at = None  # monotonic time the job last settled
+        self.changed = threading.Condition()
+        self.add_event("queued")
+
+    def add_event(self, status: str, message: str = ""):
+        with self.changed:
+            self.status = status
+            self.finished_at = time.monotonic() if status in TERMINAL_STATUSES else None
+            self.events.append({"status": status, "message": message, "at": _now()})
+            self.changed.notify_all()
+
+    def summary(self) -> dict:
+        return {
+            "job_id": self.id,
+            "chapter_title": self.request.chapter_title,
+            "num_questions": self.request.num_questions,
+            "status": self.status,
+            "created_at": self.created_at,
+            "spreadsheet_id": self.spreadsheet_id,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Queues generation/publish work on a bounded thread pool. Identical requests
+    (same chapter title, text and question count) are coalesced onto one job,
+    so many teachers asking for the same chapter cost a single generation.
+    A failed job keeps whatever it finished: resubmitting it redoes only the
+    translation or the publish that failed.
+    Settled jobs are dropped after `job_ttl` seconds, oldest first beyond `max_jobs`.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_queued: int = MAX_QUEUED_JOBS,
+                 job_ttl: float = JOB_TTL_SECONDS, max_jobs: int = MAX_JOBS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quiz-job")
+        self.max_queued = max_queued
+        self.job_ttl = job_ttl
+        self.max_jobs = max_jobs
+        self.jobs = {}
+        self.jobs_by_key = {}
+        self.lock = threading.Lock()
+
+    def active_count(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status not in TERMINAL_STATUSES)
+
+    def _evict(self):
+        """Drops settled jobs past their TTL, then the oldest settled ones over max_jobs (caller holds the lock)."""
+        settled = sorted((job for job in self.jobs.values() if job.finished_at is not None),
+                         key=lambda job: job.finished_at)
+        expired = [job for job in settled if time.monotonic() - job.finished_at > self.job_ttl]
+        overflow = max(0, len(self.jobs) - len(expired) - self.max_jobs)
+        for job in expired + [job for job in settled if job not in expired][:overflow]:
+            del self.jobs[job.id]
+            if self.jobs_by_key.get(job.key) is job:
+                del self.jobs_by_key[job.key]
+
+    def submit(self, request: JobRequest):
+        key = (request.chapter_title, content_hash(request.chapter_text), request.num_questions)
+        with self.lock:
+            self._evict()
+            existing = self.jobs_by_key.get(key)
+            if existing and existing.status != "failed":
+                return existing, True
+            if existing and existing.translated:
+                # Only the publish failed: retry just that
+                self._start_publish(existing)
+                return existing, True
+            if existing and existing.quiz is not None:
+                # Translation failed: _generate keeps the English quiz and translates again
+                existing.error = None
+                existing.add_event("queued", "retrying translation")
+                self.executor.submit(self._generate, existing)
+                return existing, True
+            if self.active_count() >= self.max_queued:
+                raise HTTPException(status_code=429, detail="Too many queued jobs, try again later")
+            job = Job(request, key)
+            self.jobs[job.id] = job
+            self.jobs_by_key[key] = job
+        self.executor.submit(self._generate, job)
+        return job, False
+
+    def get(self, job_id: str) -> Job:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+        return job
+
+    def publish(self, job: Job):
+        with self.lock:
+            if not job.translated or job.status not in ("generated", "published", "failed"):
+                raise HTTPException(status_code=409, detail=f"Job is {job.status}, not ready to publish")
+            self._start_publish(job)
+
+    def _start_publish(self, job: Job):
+        job.error = None
+        job.add_event("publishing")
+        self.executor.submit(self._publish, job)
+
+    def _generate(self, job: Job):
+        try:
+            with ledger_context(run_id=f"job-{job.id}", chapter=job.request.chapter_title):
+                if job.quiz is None:
+                    job.add_event("generating", f"{job.request.num_questions} questions")
+                    started = time.monotonic()
+                    job.quiz = generate_quiz_json(job.request.chapter_text, job.request.num_questions)
+                    record_chapter(len(job.quiz["Questions"]), time.monotonic() - started)
+                if TRANSLATION_LANGUAGES:
+                    job.add_event("translating")
+                job.quiz = translate_quiz_json(job.quiz)
+                job.translated = True
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.add_event("failed", job.error)
+            return
+        job.add_event("generated", f"{len(job.quiz['Questions'])} questions")
+
+    def _publish(self, job: Job):
+        try:
+            df = quiz_json_to_dataframe(job.quiz)
+            spreadsheet_id, creds = upload_to_sheet(df, job.request.chapter_title)
+            apply_conditional_formatting(spreadsheet_id, job.request.chapter_title, df, creds)
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.add_event("failed", job.error)
+            return
+        job.spreadsheet_id = spreadsheet_id
+        job.add_event("published", spreadsheet_id)
+
+
+app = FastAPI(title="Indic Quiz Service")
+jobs = JobManager()
+
+_sheet_sync = None
+_sheet_sync_lock = threading.Lock()
+
+
+def get_sheet_sync():
+    """Opened on first use; a background thread keeps it in step with the sheet."""
+    global _sheet_sync
+    with _sheet_sync_lock:
+        if _sheet_sync is None:
+            _sheet_sync = open_sheet_sync()
+            _sheet_sync.start()
+        return _sheet_sync
+
+
+@app.post("/jobs", status_code=202)
+def create_job(request: JobRequest):
+    job, deduplicated = jobs.submit(request)
+    return {**job.summary(), "deduplicated": deduplicated}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    return jobs.get(job_id).summary()
+
+
+@app.get("/jobs/{job_id}/events")
+def stream_job_events(job_id: str):
+    """Server-sent events with every status change until the job settles."""
+    job = jobs.get(job_id)
+
+    def event_stream():
+        sent = 0
+        while True:
+            with job.changed:
+                if sent == len(job.events):
+                    if job.status in TERMINAL_STATUSES:
+                        return
+                    job.changed.wait(timeout=15)
+                new_events = job.events[sent:]
+            if not new_events:
+                yield ": keep-alive\n\n"
+            for event in new_events:
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+            sent += len(new_events)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    job = jobs.get(job_id)
+    if job.quiz is None:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}, no result yet")
+    return job.quiz
+
+
+@app.post("/jobs/{job_id}/publish", status_code=202)
+def publish_job(job_id: str):
+    job = jobs.get(job_id)
+    jobs.publish(job)
+    return job.summary()
+
+
+@app.get("/chapters")
+def list_chapters():
+    return {"chapters": get_sheet_sync().chapters()}
+
+
+@app.get("/chapters/{chapter_title}/quiz")
+def get_chapter_quiz(chapter_title: str, question_type: str = None):
+    sync = get_sheet_sync()
+    if chapter_title not in sync.tabs:
+        raise HTTPException(status_code=404, detail=f"Chapter not published: {chapter_title}")
+    if question_type is None:
+        return sync.quiz(chapter_title)
+    return {"Topic": chapter_title, "Questions": sync.questions(chapter_title, question_type)}
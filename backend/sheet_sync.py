@@ -0,0 +1,232 @@
+# backend/sheet_sync.py
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from chapter_manifest import write_json_atomic
+from utils.gsheets import get_spreadsheet_revision
+
+OPTION_COLUMNS = ("Option A", "Option B", "Option C", "Option D")
+
+
+def sheet_range(title: str) -> str:
+    """A1 range covering a whole tab; quotes in the title are doubled."""
+    return "'" + title.replace("'", "''") + "'"
+
+
+def _number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def row_to_question(row: dict) -> dict:
+    """
+    Inverse of gurukula_quizgen.question_to_row, so questions corrected by hand
+    in the sheet are served in the pipeline's question format. Empty option
+    cells are dropped and the remaining options re-lettered; Right_Option and
+    the translated options follow the new letters.
+    """
+    kept = [i for i, column in enumerate(OPTION_COLUMNS) if row.get(column)]
+    relabel = {"abcd"[old]: "abcd"[new] for new, old in enumerate(kept)}
+    right = row.get("Right Answer", "").replace(" ", "").lower()
+    question = {
+        "Question": row.get("Question", ""),
+        "Question_type": row.get("Type", "") or "SCQ",
+        "Options": [f"{'abcd'[new]}. {row[OPTION_COLUMNS[old]]}" for new, old in enumerate(kept)],
+        "Right_Option": "".join(relabel[letter] for letter in right if letter in relabel),
+        "Number_Of_Points_Earned": _number(row.get("Points")),
+        "Chapter": row.get("Chapter", ""),
+        "Timer": _number(row.get("Timer")),
+    }
+
+    translations = {}
+    for column, value in row.items():
+        if not column.endswith(")") or " (" not in column:
+            continue
+        field, language = column[:-1].rsplit(" (", 1)
+        entry = translations.setdefault(language, {"Question": "", "Options": [""] * len(kept)})
+        if field == "Question":
+            entry["Question"] = value
+        elif field in OPTION_COLUMNS and OPTION_COLUMNS.index(field) in kept:
+            entry["Options"][kept.index(OPTION_COLUMNS.index(field))] = value
+    if translations:
+        question["Translations"] = translations
+    return question
+
+
+def rows_from_values(values: list) -> list:
+    """
+    Header row plus data rows (trailing empty cells omitted by the API) -> list
+    of dicts with every cell as a string.
+    """
+    if not values:
+        return []
+    header = values[0]
+    return [
+        dict(zip(header, [str(cell) for cell in row] + [""] * (len(header) - len(row))))
+        for row in values[1:] if any(str(cell).strip() for cell in row)
+    ]
+
+
+class SheetSync:
+    """
+    Read-through, in-memory copy of the published chapter tabs. Queries are
+    answered from memory only; `refresh` pays one Drive call to compare the
+    spreadsheet version and, only if it moved, one metadata read plus one
+    `values.batchGet` per `tabs_per_request` tabs. Tabs whose values did not
+    change keep their parsed questions. The copy is also kept in `cache_path`,
+    so a restart with an unchanged spreadsheet makes no Sheets calls.
+
+    If Drive reports no version for the spreadsheet, changes cannot be
+    detected cheaply; the tabs are then pulled every `unversioned_interval`
+    seconds instead.
+    """
+
+    def __init__(self, spreadsheet, creds, cache_path: str = None, min_interval: float = 300,
+                 tabs_per_request: int = 50, unversioned_interval: float = 3600):
+        self.spreadsheet = spreadsheet  # gspread.Spreadsheet
+        self.creds = creds
+        self.cache_path = cache_path
+        self.min_interval = min_interval
+        self.unversioned_interval = unversioned_interval
+        self.tabs_per_request = tabs_per_request
+        self.versioned = True  # False once Drive returned no version
+        self.version = None
+        self.tabs = {}  # title -> {"hash": ..., "rows": [...], "questions": [...]}
+        self.checked_at = None  # monotonic time of the last check; None until the first
+        self.refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._load_cache()
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        with open(self.cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("spreadsheet_id") != self.spreadsheet.id:
+            return
+        self.version = cached["version"]
+        self.tabs = {
+            title: {**tab, "questions": [row_to_question(row) for row in tab["rows"]]}
+            for title, tab in cached["tabs"].items()
+        }
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        write_json_atomic(self.cache_path, {
+            "spreadsheet_id": self.spreadsheet.id,
+            "version": self.version,
+            "tabs": {title: {"hash": tab["hash"], "rows": tab["rows"]} for title, tab in self.tabs.items()},
+        })
+
+    # ======== Sync ========
+    def refresh(self, force: bool = False) -> list:
+        """
+        Pulls the tabs if the spreadsheet changed since the last sync; returns
+        the titles of tabs that were added, edited or removed. Without `force`,
+        the version is checked at most once per `min_interval` seconds (the
+        tabs pulled once per `unversioned_interval` if there is no version).
+        """
+        with self.refresh_lock:
+            interval = self.min_interval if self.versioned else self.unversioned_interval
+            if not force and self.checked_at is not None and time.monotonic() - self.checked_at < interval:
+                return []
+            self.checked_at = time.monotonic()
+
+            version = get_spreadsheet_revision(self.spreadsheet.id, self.creds)
+            if version is None and self.versioned:
+                print(f"⚠️ Drive reports no version for the spreadsheet; pulling every tab each "
+                      f"{self.unversioned_interval:.0f}s instead of checking every {self.min_interval:.0f}s.")
+            self.versioned = version is not None
+            if version is not None and version == self.version and not force:
+                return []
+
+            titles = [worksheet.title for worksheet in self.spreadsheet.worksheets()]
+            fetched = {}
+            for start in range(0, len(titles), self.tabs_per_request):
+                chunk = titles[start:start + self.tabs_per_request]
+                response = self.spreadsheet.values_batch_get([sheet_range(title) for title in chunk])
+                for title, value_range in zip(chunk, response.get("valueRanges", [])):
+                    fetched[title] = value_range.get("values", [])
+
+            tabs, changed = {}, []
+            for title, values in fetched.items():
+                digest = hashlib.sha256(json.dumps(values, ensure_ascii=False).encode("utf-8")).hexdigest()
+                previous = self.tabs.get(title)
+                if previous is not None and previous["hash"] == digest:
+                    tabs[title] = previous
+                    continue
+                rows = rows_from_values(values)
+                tabs[title] = {"hash": digest, "rows": rows, "questions": [row_to_question(row) for row in rows]}
+                changed.append(title)
+            changed.extend(title for title in self.tabs if title not in tabs)
+
+            self.tabs = tabs  # swapped in one step; readers see the old or the new copy
+            self.version = version
+            if changed:
+                print(f"🔄 Synced {len(changed)} changed tab(s) from the sheet: {', '.join(changed)}")
+            self._save_cache()
+            return changed
+
+    def start(self, interval: float = None) -> threading.Thread:
+        """Refreshes in a daemon thread every `interval` seconds (default `min_interval`)."""
+        interval = interval or self.min_interval
+
+        def loop():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️ Sheet sync failed: {e}")
+                if self._stop.wait(interval):
+                    return
+
+        thread = threading.Thread(target=loop, name="sheet-sync", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    # ======== Queries (memory only) ========
+    def chapters(self) -> list:
+        return list(self.tabs)
+
+    def questions(self, chapter_title: str, question_type: str = None) -> list:
+        tab = self.tabs.get(chapter_title)
+        if tab is None:
+            return []
+        if question_type is None:
+            return list(tab["questions"])
+        return [q for q in tab["questions"] if q["Question_type"].upper() == question_type.upper()]
+
+    def quiz(self, chapter_title: str):
+        """The chapter's questions as {"Topic", "Questions"}, or None if it is not published."""
+        if chapter_title not in self.tabs:
+            return None
+        return {"Topic": chapter_title, "Questions": self.questions(chapter_title)}
+
+
+def open_sheet_sync(config: dict = None) -> SheetSync:
+    """SheetSync over the configured spreadsheet (`spreadsheet.name`, `sheet_sync` in app_config)."""
+    import gspread
+    from google.oauth2.service_account import Credentials
+    from config import env_config, app_config
+
+    config = app_config.get("sheet_sync", {}) if config is None else config
+    creds = Credentials.from_service_account_file(env_config["SERVICE_ACCOUNT_FILE"], scopes=env_config["GOOGLE_SCOPES"])
+    spreadsheet = gspread.authorize(creds).open(app_config["spreadsheet"]["name"])
+    return SheetSync(
+        spreadsheet,
+        creds,
+        cache_path=config.get("cache_path", "data/sheet_cache.json"),
+        min_interval=config.get("refresh_seconds", 300),
+        tabs_per_request=config.get("tabs_per_request", 50),
+        unversioned_interval=config.get("unversioned_refresh_seconds", 3600),
+    )
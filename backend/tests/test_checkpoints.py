@@ -0,0 +1,18 @@
+from checkpoints import ChapterCheckpoint
+
+FINGERPRINT = {"text": "abc", "num_questions": 15}
+
+
+def test_checkpoint_is_keyed_by_fingerprint(tmp_path):
+    ChapterCheckpoint(str(tmp_path), "chapter1", FINGERPRINT).save("generated", {"Questions": []})
+    assert ChapterCheckpoint(str(tmp_path), "chapter1", FINGERPRINT).load("generated") == {"Questions": []}
+    assert ChapterCheckpoint(str(tmp_path), "chapter1", {**FINGERPRINT, "num_questions": 10}).load("generated") is None
+
+
+def test_clear_drops_every_stage(tmp_path):
+    checkpoint = ChapterCheckpoint(str(tmp_path), "chapter1", FINGERPRINT)
+    checkpoint.save("generated", {"Questions": []})
+    checkpoint.save("published", {"spreadsheet_id": "s"})
+    checkpoint.clear()
+    assert checkpoint.load("generated") is None and checkpoint.load("published") is None
+    checkpoint.clear()  # nothing left to remove
@@ -0,0 +1,46 @@
+from grounding import GroundingIndex, fold_iast, tokenize
+
+CHAPTER = (
+    "Kaṃsa summoned Pūtanā and ordered her to kill every newborn child. "
+    "Pūtanā smeared poison on her breast and fed baby Kṛiṣhṇa in Gokula.\n"
+    "Later, Tṛṇāvarta came to Gokula as a whirlwind and carried Kṛiṣhṇa into the sky."
+)
+
+
+def test_fold_iast_matches_plain_spelling():
+    assert fold_iast("Kṛiṣhṇa") == "krishna"
+
+
+def test_tokenize_drops_stopwords_and_stems():
+    assert tokenize("Which of the following demons killed Pūtanā?") == ["demon", "kill", "putana"]
+
+
+def test_supported_question_scores_higher():
+    index = GroundingIndex(CHAPTER)
+    supported = index.score({"Question": "What did Pūtanā smear on her breast?",
+                             "Options": ["a. Poison", "b. Honey", "c. Sandal", "d. Ghee"], "Right_Option": "a"})
+    unsupported = index.score({"Question": "Which river flows through Hastinapura?",
+                               "Options": ["a. Ganga", "b. Sarasvati", "c. Narmada", "d. Kaveri"], "Right_Option": "a"})
+    assert supported["support"] == 1.0
+    assert unsupported["support"] < 0.15
+
+
+HINDI_CHAPTER = (
+    "कंस ने पूतना नाम की राक्षसी को गोकुल भेजा। "
+    "पूतना ने अपने स्तन पर विष लगाकर बालक कृष्ण को दूध पिलाया।\n"
+    "कृष्ण ने दूध के साथ उसके प्राण भी खींच लिए॥"
+)
+
+
+def test_tokenize_keeps_devanagari_words_whole():
+    assert tokenize("कंस ने राक्षसी भेजी।") == ["कंस", "ने", "राक्षसी", "भेजी"]
+
+
+def test_devanagari_question_is_grounded():
+    index = GroundingIndex(HINDI_CHAPTER)
+    supported = index.score({"Question": "कंस ने किस राक्षसी को गोकुल भेजा?",
+                             "Options": ["a. पूतना", "b. तृणावर्त", "c. बकासुर", "d. अघासुर"], "Right_Option": "a"})
+    unsupported = index.score({"Question": "हस्तिनापुर किस नदी के किनारे है?",
+                               "Options": ["a. गंगा", "b. यमुना", "c. नर्मदा", "d. कावेरी"], "Right_Option": "a"})
+    assert supported["support"] > 0.5
+    assert unsupported["support"] < 0.15
@@ -0,0 +1,105 @@
+import time
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from model_router import CircuitBreaker, ModelRouter, RoutesOpenError
+from indic_quiz_generator_pipeline import is_quiz_reply
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0.01)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.02)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+
+class SlowAgent:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def run(self, prompt):
+        time.sleep(self.delay)
+        return SimpleNamespace(content="ok")
+
+
+def test_timed_out_call_records_the_deadline_as_latency():
+    router = ModelRouter(["slow"], lambda model_id: SlowAgent(0.3), deadline=0.05)
+    with pytest.raises(TimeoutError):
+        router.run("prompt")
+    assert list(router.latencies["slow"]) == [0.05]
+
+
+def test_all_open_breakers_fail_fast_without_calling():
+    calls = []
+
+    class CountingAgent(SlowAgent):
+        def run(self, prompt):
+            calls.append(prompt)
+            return super().run(prompt)
+
+    router = ModelRouter(["a", "b"], lambda model_id: CountingAgent(0), reset_after=60)
+    for breaker in router.breakers.values():
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+    with pytest.raises(RoutesOpenError, match="All routes open"):
+        router.run("prompt")
+    assert calls == []
+
+
+def test_reply_is_validated_once():
+    checked = []
+    router = ModelRouter(["m"], lambda model_id: SlowAgent(0),
+                         is_valid=lambda response: checked.append(response) or True)
+    router.run("prompt")
+    assert len(checked) == 1
+
+
+def test_agents_are_not_shared_between_threads():
+    agents = []
+
+    class RecordingAgent(SlowAgent):
+        def run(self, prompt):
+            self.threads.add(threading.get_ident())
+            return super().run(prompt)
+
+    def factory(model_id):
+        agent = RecordingAgent(0.05)
+        agent.threads = set()
+        agents.append(agent)
+        return agent
+
+    router = ModelRouter(["m"], factory, max_workers=4)
+    threads = [threading.Thread(target=router.run, args=("prompt",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(len(agent.threads) == 1 for agent in agents)
+
+
+@pytest.mark.parametrize("content, expected", [
+    ('{"Quiz": {"Topic": "T", "Questions": []}}', True),
+    ('"{\\"Questions\\": [{}]}"', True),
+    ('Here you go:\n```json\n{"Quiz": {"Questions": [{}]}}\n```', True),
+    ('{"Chapters": {"c1": {"Quiz": {"Questions": []}}}}', True),
+    ('{"Quiz": {"Questions": "none"}}', False),
+    ("Sorry, I cannot generate questions for this chapter.", False),
+    (None, False),
+])
+def test_is_quiz_reply(content, expected):
+    assert is_quiz_reply(SimpleNamespace(content=content)) is expected
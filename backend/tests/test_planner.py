@@ -0,0 +1,48 @@
+from indic_quiz_generator_pipeline import assemble_quiz
+from planner import RunStats, chapter_capacity, plan_requests, split_targets, suggest_question_count
+
+MODELS = {"SCQ": "scq-model", "MCQ": "mcq-model"}
+
+
+def test_split_targets_gives_scq_the_odd_question():
+    assert split_targets(15) == {"SCQ": 8, "MCQ": 7}
+
+
+def test_question_count_follows_chapter_length():
+    assert chapter_capacity("word " * 400) == 10
+    assert suggest_question_count("word " * 40) == 5
+    assert suggest_question_count("word " * 4000) == 20
+
+
+def test_plan_without_history_uses_default_yields(tmp_path):
+    plan = plan_requests(15, RunStats(str(tmp_path / "stats.json")), MODELS)
+    assert plan["SCQ"] == {"target": 8, "request": 11}
+    assert plan["MCQ"] == {"target": 7, "request": 15}
+
+
+def test_run_stats_persist_between_instances(tmp_path):
+    path = str(tmp_path / "stats.json")
+    RunStats(path).record("scq-model", "SCQ", 10, 10)
+    assert RunStats(path).entries["scq-model|SCQ"] == {"requested": 10, "kept": 10, "runs": 1}
+
+
+def make_questions(qtype: str, n: int) -> list:
+    right, subject = ("a", "Pūtanā") if qtype == "SCQ" else ("ab", "Tṛṇāvarta, the whirlwind demon")
+    return [{"Question": f"Question {i}: {subject * (i + 1)}?", "Question_type": qtype,
+             "Options": ["a. w", "b. x", "c. y", "d. z"], "Right_Option": right} for i in range(n)]
+
+
+def test_over_production_lowers_the_next_request(tmp_path):
+    stats = RunStats(str(tmp_path / "stats.json"))
+    first = plan_requests(15, stats, MODELS)
+    assert first["SCQ"] == {"target": 8, "request": 11}
+
+    # Every requested SCQ was usable, three more than the quiz needed
+    scq_data = {"Questions": make_questions("SCQ", 11), "Stats": {"model": "scq-model", "requested": 11}}
+    mcq_data = {"Questions": make_questions("MCQ", 15), "Stats": {"model": "mcq-model", "requested": 15}}
+    quiz = assemble_quiz(scq_data, mcq_data, split_targets(15), stats)
+    assert len(quiz["Quiz"]["Questions"]) == 15
+    assert stats.entries["scq-model|SCQ"]["kept"] == 11
+
+    second = plan_requests(15, stats, MODELS)
+    assert second["SCQ"]["request"] < first["SCQ"]["request"]
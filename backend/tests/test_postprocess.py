@@ -0,0 +1,34 @@
+from indic_quiz_generator_pipeline import finalize_questions
+from postprocess import PostProcessPool, pack_questions, unpack_questions
+
+
+def make_question(i, qtype="SCQ", right="a"):
+    return {
+        "Question": f"Who killed demon number {i} in {qtype} form?",
+        "Question_type": qtype,
+        "Options": ["a. Kṛiṣhṇa", "b. Balarāma", "c. Nanda", "d. Kaṃsa"],
+        "Right_Option": right,
+        "Number_Of_Points_Earned": 10,
+        "Chapter": "Chapter 16",
+        "Timer": 20,
+        "Translations": {"hi": {"Question": "प्रश्न"}},
+    }
+
+
+def selection(n):
+    scqs = [make_question(i) for i in range(n)]
+    mcqs = [make_question(i + 100, "MCQ", "ab") for i in range(n)] + [make_question(0)]
+    return scqs, mcqs, {"SCQ": n - 1, "MCQ": n - 1}
+
+
+def test_pack_round_trip_keeps_extra_fields():
+    questions = [make_question(1), "not a question"]
+    assert unpack_questions(pack_questions(questions)) == questions
+
+
+def test_submitted_finalize_matches_inline():
+    items = [selection(n) for n in range(2, 7)]
+    expected = [finalize_questions(*item) for item in items]
+    with PostProcessPool(workers=2, chunk_size=2) as pool:
+        collect = pool.submit_finalize(items)
+        assert collect() == expected
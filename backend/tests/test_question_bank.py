@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from question_bank import QuestionBank, question_id, write_question_bank
+
+
+def make_table(prefix: str) -> pd.DataFrame:
+    return pd.DataFrame([
+        {"Chapter": prefix, "Timer": 20, "Points": 10, "Type": "MCQ", "Question": f"{prefix} MCQ?",
+         "Option A": "a", "Option B": "b", "Option C": "c", "Option D": "d", "Right Answer": "ab"},
+        {"Chapter": prefix, "Timer": 15, "Points": 10, "Type": "SCQ", "Question": f"{prefix} SCQ?",
+         "Option A": "Pūtanā", "Option B": "b", "Option C": "c", "Option D": "d", "Right Answer": "a"},
+    ])
+
+
+def test_round_trip_and_lookups(tmp_path):
+    path = str(tmp_path / "bank.qbank")
+    assert write_question_bank(path, {"chapter1": make_table("c1"), "chapter2": make_table("c2")}) == 4
+
+    with QuestionBank(path) as bank:
+        assert len(bank) == 4
+        assert bank.chapters() == ["chapter1", "chapter2"]
+        assert [q["Question"] for q in bank.questions("chapter1", "SCQ")] == ["c1 SCQ?"]
+        record = bank.get(question_id("chapter2", "c2 SCQ?"))
+        assert record["Option A"] == "Pūtanā"
+        assert bank.get(question_id("chapter3", "missing?")) is None
+        assert len(bank.question_range("chapter2")) == 2
+
+
+def test_numbers_come_back_as_int_and_close_with_fields_held(tmp_path):
+    path = str(tmp_path / "bank.qbank")
+    write_question_bank(path, {"chapter1": make_table("c1")})
+
+    bank = QuestionBank(path)
+    record = bank.questions("chapter1", "MCQ")[0]
+    assert record["Timer"] == 20 and record["Points"] == 10
+    assert record["Type"] == "MCQ"
+    held = bank.raw(bank.question_range("chapter1", "MCQ")[0], "Question")
+    bank.close()
+    assert held == b"c1 MCQ?"
+
+
+def test_raw_view_must_be_released_before_close(tmp_path):
+    path = str(tmp_path / "bank.qbank")
+    write_question_bank(path, {"chapter1": make_table("c1")})
+
+    bank = QuestionBank(path)
+    view = bank.raw_view(bank.question_range("chapter1", "SCQ")[0], "Option A")
+    assert bytes(view).decode("utf-8") == "Pūtanā"
+    with pytest.raises(BufferError, match="raw_view"):
+        bank.close()
+    view.release()
+    bank.close()
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+import ledger
+import quiz_service
+from quiz_service import JobManager, JobRequest
+
+QUIZ = {"Topic": "T", "Questions": [{"Question": "Q?"}]}
+
+
+@pytest.fixture(autouse=True)
+def no_ledger(monkeypatch):
+    monkeypatch.setattr(ledger, "_ledger", None)
+
+
+@pytest.fixture
+def make_manager(monkeypatch):
+    # Depends on monkeypatch so the jobs drain before the patches are undone.
+    managers = []
+
+    def make(**kwargs):
+        manager = JobManager(**kwargs)
+        managers.append(manager)
+        return manager
+    yield make
+    for manager in managers:
+        manager.executor.shutdown(wait=True)
+
+
+def wait_until_settled(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while job.status not in quiz_service.TERMINAL_STATUSES and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job.status
+
+
+def request(title="chapter1", text="Pūtanā came to Gokula."):
+    return JobRequest(chapter_title=title, chapter_text=text, num_questions=5)
+
+
+def test_same_text_under_another_title_is_a_new_job(monkeypatch, make_manager):
+    monkeypatch.setattr(quiz_service, "generate_quiz_json", lambda text, n: QUIZ)
+    manager = make_manager(max_workers=1)
+    first, _ = manager.submit(request("chapter1"))
+    again, deduplicated = manager.submit(request("chapter1"))
+    other, other_deduplicated = manager.submit(request("chapter2"))
+    assert again is first and deduplicated
+    assert other is not first and not other_deduplicated
+
+
+def test_failed_publish_is_retried_without_regenerating(monkeypatch, make_manager):
+    generated, uploads = [], []
+
+    def upload(df, title):
+        uploads.append(title)
+        if len(uploads) == 1:
+            raise RuntimeError("quota")
+        return "sheet-id", None
+
+    monkeypatch.setattr(quiz_service, "generate_quiz_json", lambda text, n: generated.append(text) or QUIZ)
+    monkeypatch.setattr(quiz_service, "quiz_json_to_dataframe", lambda quiz: None)
+    monkeypatch.setattr(quiz_service, "upload_to_sheet", upload)
+    monkeypatch.setattr(quiz_service, "apply_conditional_formatting", lambda *args: None)
+    manager = make_manager(max_workers=1)
+
+    job, _ = manager.submit(request())
+    assert wait_until_settled(job) == "generated"
+    manager.publish(job)
+    assert wait_until_settled(job) == "failed"
+
+    retried, deduplicated = manager.submit(request())
+    assert retried is job and deduplicated
+    assert wait_until_settled(job) == "published"
+    assert len(generated) == 1 and len(uploads) == 2
+
+
+def test_settled_jobs_are_evicted(monkeypatch, make_manager):
+    monkeypatch.setattr(quiz_service, "generate_quiz_json", lambda text, n: QUIZ)
+    manager = make_manager(max_workers=1, max_jobs=2)
+    jobs = []
+    for i in range(4):
+        job, _ = manager.submit(request(f"chapter{i}"))
+        wait_until_settled(job)
+        jobs.append(job)
+    manager.submit(request("chapter4"))
+    assert jobs[0].id not in manager.jobs and jobs[1].id not in manager.jobs
+    assert jobs[3].id in manager.jobs
+
+    manager.job_ttl = 0
+    time.sleep(0.01)
+    manager.submit(request("chapter5"))
+    assert jobs[3].id not in manager.jobs
+
+
+def test_failed_translation_keeps_the_english_quiz(monkeypatch, make_manager):
+    generated, attempts = [], []
+
+    def translate(quiz):
+        attempts.append(quiz)
+        if len(attempts) == 1:
+            raise RuntimeError("translation reply was cut off")
+        return {**quiz, "Translated": True}
+
+    monkeypatch.setattr(quiz_service, "generate_quiz_json", lambda text, n: generated.append(text) or QUIZ)
+    monkeypatch.setattr(quiz_service, "translate_quiz_json", translate)
+    manager = make_manager(max_workers=1)
+
+    job, _ = manager.submit(request())
+    assert wait_until_settled(job) == "failed"
+    assert job.quiz == QUIZ and not job.translated
+
+    manager.submit(request())
+    assert wait_until_settled(job) == "generated"
+    assert job.quiz["Translated"] and len(generated) == 1
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from indic_quiz_generator_pipeline import parse_quiz_reply, validate_questions, balance_answer_keys, repair_questions
+
+CHAPTER = (
+    "Kaṃsa summoned Pūtanā and ordered her to kill every newborn child. "
+    "Pūtanā smeared poison on her breast and fed baby Kṛiṣhṇa in Gokula. "
+    "Kṛiṣhṇa sucked out her life along with the milk."
+)
+
+
+def make_question(question="Whom did Kaṃsa send to Gokula?", qtype="SCQ", right="a",
+                  options=("Pūtanā", "Tṛṇāvarta", "Śhakaṭāsura", "Bakāsura"), timer=20):
+    return {
+        "Question": question,
+        "Question_type": qtype,
+        "Options": [f"{label}. {text}" for label, text in zip("abcd", options)],
+        "Right_Option": right,
+        "Number_Of_Points_Earned": 10,
+        "Chapter": "Chapter 16",
+        "Timer": timer,
+    }
+
+
+def test_parse_quiz_reply_json_mode():
+    reply = json.dumps({"Quiz": {"Topic": "Pūtanā", "Questions": [make_question()]}}, ensure_ascii=False)
+    quiz = parse_quiz_reply(reply, "SCQ")
+    assert quiz["Topic"] == "Pūtanā"
+    assert quiz["Questions"][0]["Right_Option"] == "a"
+
+
+def test_parse_quiz_reply_string_wrapped():
+    reply = json.dumps(json.dumps({"Quiz": {"Topic": "T", "Questions": [make_question()]}}))
+    assert len(parse_quiz_reply(reply, "SCQ")["Questions"]) == 1
+
+
+def test_parse_quiz_reply_falls_back_for_fenced_text():
+    body = json.dumps({"Quiz": {"Topic": "T", "Questions": [make_question()]}}, ensure_ascii=False)
+    quiz = parse_quiz_reply(f"Here is your quiz:\n```json\n{body}\n```", "SCQ")
+    assert quiz["Questions"][0]["Question"] == "Whom did Kaṃsa send to Gokula?"
+
+
+def test_validate_questions_flags_only_bad_questions():
+    questions = [
+        make_question(),
+        make_question(right="e"),
+        make_question(options=("Pūtanā", "Pūtanā", "Bakāsura", "Aghāsura")),
+        make_question(qtype="MCQ", right="a"),
+    ]
+    flagged = validate_questions(questions, "SCQ")
+    assert 0 not in flagged
+    assert any("Right_Option" in issue for issue in flagged[1])
+    assert "Options: duplicate options" in flagged[2]
+    assert 3 in flagged
+
+
+def test_validate_questions_flags_quoted_points():
+    question = make_question()
+    question["Number_Of_Points_Earned"] = "10"
+    assert "Number_Of_Points_Earned" in validate_questions([question], "SCQ")[0][0]
+
+
+def test_repair_questions_coerces_numeric_strings_without_regenerating():
+    question = make_question(timer="20")
+    question["Number_Of_Points_Earned"] = "10"
+    # agent=None: any regeneration call would fail
+    valid = repair_questions(None, CHAPTER, [question], "SCQ", min_valid=1)
+    assert valid[0]["Timer"] == 20 and valid[0]["Number_Of_Points_Earned"] == 10
+
+
+def test_validate_questions_flags_ungrounded_question():
+    grounded = make_question()
+    ungrounded = make_question(question="Which river flows through Hastinapura?",
+                               options=("Ganga", "Sarasvati", "Narmada", "Kaveri"))
+    flagged = validate_questions([grounded, ungrounded], "SCQ", CHAPTER)
+    assert 0 not in flagged
+    assert flagged[1][0].startswith("Grounding:")
+
+
+def test_balance_answer_keys_spreads_letters_and_keeps_answers():
+    questions = [make_question(question=f"Q{i}?") for i in range(8)]
+    balanced = balance_answer_keys(questions)
+    letters = [q["Right_Option"] for q in balanced]
+    assert sorted(letters) == sorted("aabbccdd")
+    for q in balanced:
+        right_text = q["Options"]["abcd".index(q["Right_Option"])]
+        assert right_text.endswith("Pūtanā")
+
+
+def test_balance_answer_keys_is_deterministic():
+    first = balance_answer_keys([make_question(question=f"Q{i}?") for i in range(5)])
+    second = balance_answer_keys([make_question(question=f"Q{i}?") for i in range(5)])
+    assert first == second
+
+
+def test_balance_answer_keys_skips_zero_weight_letters():
+    questions = [make_question(question=f"Q{i}?") for i in range(6)]
+    balanced = balance_answer_keys(questions, {"a": 1, "b": 1, "c": 0, "d": 0})
+    assert sorted(q["Right_Option"] for q in balanced) == sorted("aaabbb")
+
+
+def test_balance_answer_keys_rejects_all_zero_target():
+    with pytest.raises(ValueError):
+        balance_answer_keys([make_question()], {label: 0 for label in "abcd"})
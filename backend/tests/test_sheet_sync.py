@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import sheet_sync
+from sheet_sync import SheetSync, row_to_question, rows_from_values, sheet_range
+
+
+def test_row_to_question_inverts_sheet_row():
+    row = {"Chapter": "Chapter 16", "Timer": "20", "Points": "10", "Type": "MCQ",
+           "Question": "Who was sent by Kaṃsa?", "Option A": "Pūtanā", "Option B": "Tṛṇāvarta",
+           "Option C": "Nanda", "Option D": "Yaśhodā", "Right Answer": "ab",
+           "Question (hi)": "कंस ने किसे भेजा?", "Option A (hi)": "पूतना"}
+    q = row_to_question(row)
+    assert q["Options"] == ["a. Pūtanā", "b. Tṛṇāvarta", "c. Nanda", "d. Yaśhodā"]
+    assert q["Right_Option"] == "ab"
+    assert q["Timer"] == 20 and q["Number_Of_Points_Earned"] == 10
+    assert q["Translations"]["hi"]["Question"] == "कंस ने किसे भेजा?"
+    assert q["Translations"]["hi"]["Options"][0] == "पूतना"
+
+
+def test_row_to_question_reletters_around_empty_options():
+    row = {"Type": "MCQ", "Question": "Q?", "Option A": "Pūtanā", "Option B": "", "Option C": "Nanda",
+           "Option D": "Yaśhodā", "Right Answer": "a, c", "Option C (hi)": "नंद", "Option D (hi)": "यशोदा"}
+    q = row_to_question(row)
+    assert q["Options"] == ["a. Pūtanā", "b. Nanda", "c. Yaśhodā"]
+    assert q["Right_Option"] == "ab"
+    assert q["Translations"]["hi"]["Options"] == ["", "नंद", "यशोदा"]
+
+
+def test_rows_from_values_pads_short_rows_and_skips_blank_ones():
+    values = [["Question", "Option A", "Right Answer"], ["Q1?", "x"], ["", ""], ["Q2?", "y", "a"]]
+    assert rows_from_values(values) == [
+        {"Question": "Q1?", "Option A": "x", "Right Answer": ""},
+        {"Question": "Q2?", "Option A": "y", "Right Answer": "a"},
+    ]
+
+
+def test_rows_from_values_accepts_numeric_cells():
+    assert rows_from_values([["Timer", "Question"], [20, "Q?"], [0, ""]]) == [
+        {"Timer": "20", "Question": "Q?"},
+        {"Timer": "0", "Question": ""},
+    ]
+
+
+class FakeSpreadsheet:
+    id = "sheet-id"
+
+    def __init__(self):
+        self.pulls = 0
+
+    def worksheets(self):
+        self.pulls += 1
+        return [SimpleNamespace(title="chapter1")]
+
+    def values_batch_get(self, ranges):
+        return {"valueRanges": [{"values": [["Question"], ["Q?"]]} for _ in ranges]}
+
+
+def test_unversioned_spreadsheet_is_pulled_on_the_longer_interval(monkeypatch):
+    monkeypatch.setattr(sheet_sync, "get_spreadsheet_revision", lambda spreadsheet_id, creds: None)
+    spreadsheet = FakeSpreadsheet()
+    sync = SheetSync(spreadsheet, None, min_interval=0, unversioned_interval=3600)
+    assert sync.refresh() == ["chapter1"]
+    assert sync.refresh() == [] and spreadsheet.pulls == 1
+    assert sync.questions("chapter1")[0]["Question"] == "Q?"
+
+
+def test_first_refresh_runs_right_after_boot(monkeypatch):
+    # time.monotonic() can be smaller than the interval on a freshly booted host
+    monkeypatch.setattr(sheet_sync, "get_spreadsheet_revision", lambda spreadsheet_id, creds: "1")
+    monkeypatch.setattr(sheet_sync.time, "monotonic", lambda: 5.0)
+    sync = SheetSync(FakeSpreadsheet(), None, min_interval=300)
+    assert sync.refresh() == ["chapter1"]
+
+
+def test_sheet_range_quotes_titles():
+    assert sheet_range("it's chapter 1") == "'it''s chapter 1'"
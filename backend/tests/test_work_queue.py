@@ -0,0 +1,62 @@
+import time
+
+from work_queue import WorkQueue
+
+
+def make_queue(tmp_path, **kwargs):
+    queue = WorkQueue(str(tmp_path / "queue.db"), **kwargs)
+    queue.enqueue("chapter1", "data/chapter1.txt", 15, "fp1")
+    return queue
+
+
+def test_claim_complete_is_idempotent(tmp_path):
+    queue = make_queue(tmp_path)
+    job = queue.claim("w1")
+    assert job["chapter_title"] == "chapter1"
+    assert queue.claim("w2") is None
+    assert queue.complete("chapter1", "fp1", "w1", {"spreadsheet_id": "s"})
+    assert not queue.complete("chapter1", "fp1", "w2", {"spreadsheet_id": "s"})
+    assert queue.counts() == {"done": 1}
+
+
+def test_enqueue_skips_unchanged_and_reopens_changed(tmp_path):
+    queue = make_queue(tmp_path)
+    assert not queue.enqueue("chapter1", "data/chapter1.txt", 15, "fp1")
+    assert queue.enqueue("chapter1", "data/chapter1.txt", 15, "fp2")
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.01)
+    queue.claim("w1")
+    time.sleep(0.05)
+    assert queue.claim("w2")["chapter_title"] == "chapter1"
+    assert not queue.heartbeat("chapter1", "w1")
+    assert queue.heartbeat("chapter1", "w2")
+
+
+def test_failures_stop_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    for _ in range(2):
+        queue.claim("w1")
+        queue.fail("chapter1", "w1", "boom")
+    assert queue.counts() == {"failed": 1}
+    assert not queue.has_open_work()
+
+
+def test_reopen_requeues_done_chapter(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.claim("w1")
+    queue.complete("chapter1", "fp1", "w1", {})
+    assert not queue.enqueue("chapter1", "data/chapter1.txt", 15, "fp1")
+    assert queue.enqueue("chapter1", "data/chapter1.txt", 15, "fp1", reopen=True)
+    assert queue.counts() == {"pending": 1}
+
+
+def test_expired_leases_count_as_attempts(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.01, max_attempts=2)
+    assert queue.claim("w1")["attempts"] == 0
+    time.sleep(0.05)
+    assert queue.claim("w2")["attempts"] == 1
+    time.sleep(0.05)
+    assert queue.claim("w3") is None
+    assert queue.counts() == {"failed": 1}
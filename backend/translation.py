@@ -0,0 +1,124 @@
+# backend/translation.py
+
+import os
+import re
+import json
+import time
+import fcntl
+import threading
+
+from chapter_manifest import write_json_atomic
+from ledger import ledger_context, record_call
+
+# Segments per request; a chapter's quiz normally fits in one request per language.
+MAX_SEGMENTS_PER_REQUEST = 200
+
+
+class TranslationMemory:
+    """
+    Persistent {language: {english segment: translation}} store, so recurring
+    segments (names like Kṛiṣhṇa, stock options) are only paid for once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = self._read()
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get(self, language: str, segment: str):
+        return self.entries.get(language, {}).get(segment)
+
+    def update(self, language: str, translations: dict):
+        if not translations:
+            return
+        with self.lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Merge with whatever other processes added since we loaded the file
+            with open(self.path + ".lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self.entries = self._read()
+                self.entries.setdefault(language, {}).update(translations)
+                write_json_atomic(self.path, self.entries)
+
+
+def build_translation_prompt(segments: list, language_name: str) -> str:
+    numbered = json.dumps({str(i): text for i, text in enumerate(segments)}, ensure_ascii=False, indent=1)
+    return f"""
+        You are translating quiz questions and answer options for middle and high school students into {language_name}.
+
+        == RULES ==
+        - Translate every entry of the JSON object below; keep the same keys.
+        - Keep IAST names and terms (e.g. Kṛiṣhṇa, Pūtanā, Gokula) as proper names, written in the target script.
+        - Keep any Devanagari glosses in parentheses, e.g. (राक्षसी), exactly as they are.
+        - Do not add explanations, numbering or answer letters.
+        - Reply with a single JSON object: {{"translations": {{"0": "...", "1": "...", ...}}}}
+
+        == SEGMENTS ==
+        {numbered}
+    """
+
+
+def _strip_label(option: str) -> str:
+    return re.sub(r"^[a-dA-D]\.\s*", "", option.strip())
+
+
+def translate_segments(agent, segments: list, language: str, language_name: str, memory: TranslationMemory) -> dict:
+    """Returns {segment: translation}, asking the model only for segments not in memory."""
+    result = {s: memory.get(language, s) for s in segments}
+    missing = [s for s, t in result.items() if t is None]
+
+    for start in range(0, len(missing), MAX_SEGMENTS_PER_REQUEST):
+        batch = missing[start:start + MAX_SEGMENTS_PER_REQUEST]
+        print(f"🌐 Translating {len(batch)} segment(s) into {language_name}...")
+        started = time.monotonic()
+        reply = agent.run(build_translation_prompt(batch, language_name))
+        with ledger_context(question_type=f"translation:{language}", attempt=0):
+            record_call(getattr(getattr(agent, "model", None), "id", "unknown"), reply, time.monotonic() - started)
+        try:
+            translated = json.loads(reply.content).get("translations", {})
+        except (json.JSONDecodeError, AttributeError, TypeError):
+            print(f"⚠️ Could not parse {language_name} translation reply; leaving {len(batch)} segment(s) untranslated")
+            continue
+
+        learned = {}
+        for i, segment in enumerate(batch):
+            text = translated.get(str(i))
+            if isinstance(text, str) and text.strip():
+                learned[segment] = text.strip()
+        memory.update(language, learned)
+        result.update(learned)
+
+    return {s: t for s, t in result.items() if t is not None}
+
+
+def translate_quiz(quiz_json: dict, languages: dict, memory: TranslationMemory, agent) -> dict:
+    """
+    Adds `Translations: {lang: {"Question": ..., "Options": [...]}}` to every question,
+    with one batched request per language. `languages` maps codes to names, e.g.
+    {"hi": "Hindi"}; `agent` should reply in JSON mode.
+    """
+    if not languages:
+        return quiz_json
+
+    questions = quiz_json["Questions"]
+    segments = []
+    for q in questions:
+        segments.append(q["Question"].strip())
+        segments.extend(_strip_label(opt) for opt in q["Options"])
+    segments = list(dict.fromkeys(s for s in segments if s))  # dedupe, keep order
+
+    for language, language_name in languages.items():
+        translated = translate_segments(agent, segments, language, language_name, memory)
+        for q in questions:
+            q.setdefault("Translations", {})[language] = {
+                "Question": translated.get(q["Question"].strip(), ""),
+                "Options": [translated.get(_strip_label(opt), "") for opt in q["Options"]],
+            }
+
+    return quiz_json
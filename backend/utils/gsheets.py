@@ -1,5 +1,8 @@
 # utils/gsheets.py
 
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
 def clear_all_sheet_formatting_only(sheets_api, spreadsheet_id, sheet_id):
     """
     Clears all formatting (but not data) from the specified sheet.
@@ -20,3 +23,17 @@ def clear_all_sheet_formatting_only(sheets_api, spreadsheet_id, sheet_id):
         body=request_body
     ).execute()
 
+
+
+def get_spreadsheet_revision(spreadsheet_id, creds):
+    """
+    Returns the Drive revision (`version`) of the spreadsheet, which increases on
+    every edit, or None if it cannot be read with the given credentials.
+    """
+    try:
+        drive_api = build('drive', 'v3', credentials=creds)
+        metadata = drive_api.files().get(fileId=spreadsheet_id, fields="version").execute()
+    except HttpError as e:
+        print(f"⚠️ Could not read spreadsheet revision: {e}")
+        return None
+    return metadata.get("version")
@@ -0,0 +1,187 @@
+# backend/work_queue.py
+
+import time
+import json
+import sqlite3
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chapters (
+    chapter_title TEXT PRIMARY KEY,
+    chapter_path TEXT NOT NULL,
+    num_questions INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',   -- pending | leased | done | failed
+    worker_id TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS rate_limits (
+    resource TEXT NOT NULL,
+    window_start INTEGER NOT NULL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (resource, window_start)
+);
+"""
+
+
+class LeaseLostError(RuntimeError):
+    """The worker's lease on a chapter expired and may belong to another worker now."""
+
+
+class WorkQueue:
+    """
+    Chapter work queue in a SQLite file on shared disk. Workers on any machine
+    claim chapters with time-limited leases and extend them with heartbeats;
+    a chapter whose lease expires (crashed or partitioned worker) is handed to
+    the next worker. Completion is idempotent: only the first commit counts.
+
+    The shared disk must support POSIX locks (local disk, NFSv4 with locking);
+    SQLite is not safe on file systems that ignore them.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 300, max_attempts: int = 3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can
+        # never read the same pending row and both claim it.
+        with self.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, chapter_title: str, chapter_path: str, num_questions: int, fingerprint: str,
+                reopen: bool = False) -> bool:
+        """
+        Adds a chapter, or re-opens it if its fingerprint changed (or, with
+        `reopen`, if it is not being worked on). Returns True if work was queued.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute("SELECT fingerprint, status FROM chapters WHERE chapter_title = ?",
+                               (chapter_title,)).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO chapters (chapter_title, chapter_path, num_questions, fingerprint, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (chapter_title, chapter_path, num_questions, fingerprint, now))
+                return True
+            if row["fingerprint"] == fingerprint and row["status"] != "failed":
+                if not reopen or row["status"] in ("pending", "leased"):
+                    return False
+            conn.execute(
+                "UPDATE chapters SET chapter_path = ?, num_questions = ?, fingerprint = ?, status = 'pending', "
+                "worker_id = NULL, lease_expires = NULL, attempts = 0, result = NULL, error = NULL, updated_at = ? "
+                "WHERE chapter_title = ?",
+                (chapter_path, num_questions, fingerprint, now, chapter_title))
+            return True
+
+    def claim(self, worker_id: str):
+        """
+        Leases the next pending (or expired) chapter to `worker_id`; None if
+        nothing is claimable. An expired lease counts as a failed attempt, so a
+        chapter that keeps crashing its workers ends up 'failed' as well.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT * FROM chapters WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                    "ORDER BY rowid LIMIT 1", (now,)).fetchone()
+                if row is None:
+                    return None
+                attempts = row["attempts"] + (row["status"] == "leased")
+                if attempts >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE chapters SET status = 'failed', attempts = ?, lease_expires = NULL, error = ?, "
+                        "updated_at = ? WHERE chapter_title = ?",
+                        (attempts, f"lease of {row['worker_id']} expired", now, row["chapter_title"]))
+                    continue
+                conn.execute(
+                    "UPDATE chapters SET status = 'leased', worker_id = ?, lease_expires = ?, attempts = ?, "
+                    "updated_at = ? WHERE chapter_title = ?",
+                    (worker_id, now + self.lease_seconds, attempts, now, row["chapter_title"]))
+                return {**dict(row), "attempts": attempts}
+
+    def heartbeat(self, chapter_title: str, worker_id: str) -> bool:
+        """Extends the lease; False means the lease was lost to another worker."""
+        now = time.time()
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE chapters SET lease_expires = ?, updated_at = ? "
+                "WHERE chapter_title = ? AND worker_id = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, chapter_title, worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, chapter_title: str, fingerprint: str, worker_id: str, result: dict) -> bool:
+        """Marks the chapter done once; a duplicate commit (e.g. after a lease expired) is a no-op."""
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE chapters SET status = 'done', worker_id = ?, lease_expires = NULL, result = ?, "
+                "error = NULL, updated_at = ? WHERE chapter_title = ? AND fingerprint = ? AND status != 'done'",
+                (worker_id, json.dumps(result), time.time(), chapter_title, fingerprint))
+            return cursor.rowcount == 1
+
+    def fail(self, chapter_title: str, worker_id: str, error: str):
+        """Releases the lease; the chapter goes back to pending until it runs out of attempts."""
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE chapters SET attempts = attempts + 1, error = ?, lease_expires = NULL, updated_at = ?, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END "
+                "WHERE chapter_title = ? AND worker_id = ? AND status = 'leased'",
+                (error, time.time(), self.max_attempts, chapter_title, worker_id))
+
+    def has_open_work(self) -> bool:
+        with self.connect() as conn:
+            row = conn.execute("SELECT COUNT(*) FROM chapters WHERE status IN ('pending', 'leased')").fetchone()
+            return row[0] > 0
+
+    def counts(self) -> dict:
+        with self.connect() as conn:
+            return {row["status"]: row["n"] for row in
+                    conn.execute("SELECT status, COUNT(*) AS n FROM chapters GROUP BY status")}
+
+    def acquire(self, resource: str, per_minute: int):
+        """
+        Blocks until one unit of `resource` is available in the current minute,
+        counted across all workers sharing this queue (fixed one-minute windows).
+        """
+        if not per_minute:
+            return
+        while True:
+            now = time.time()
+            window = int(now // 60)
+            with self.transaction() as conn:
+                conn.execute("DELETE FROM rate_limits WHERE window_start < ?", (window - 1,))
+                row = conn.execute("SELECT used FROM rate_limits WHERE resource = ? AND window_start = ?",
+                                   (resource, window)).fetchone()
+                used = row["used"] if row else 0
+                if used < per_minute:
+                    conn.execute(
+                        "INSERT INTO rate_limits (resource, window_start, used) VALUES (?, ?, 1) "
+                        "ON CONFLICT(resource, window_start) DO UPDATE SET used = used + 1",
+                        (resource, window))
+                    return
+            time.sleep((window + 1) * 60 - now)